@@ -0,0 +1,226 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+TOPICS = [
+    "quantum processor", "fusion reactor", "Mars rover", "gene therapy", "battery chemistry",
+    "exoplanet atmosphere", "AI chip", "solar sail", "coral reef recovery", "brain implant",
+    "satellite internet", "room-temperature superconductor", "malaria vaccine", "deep sea robot",
+    "carbon capture plant", "smartphone launch", "asteroid sample", "climate model", "robot surgeon",
+    "lunar lander"
+]
+
+SOURCES = ["Wire Service", "Daily Science", "Tech Times", "Global News", "The Observer"]
+
+class ServiceConfig:
+    """Behaviour of one fake service: latency in seconds, error and 429 rates."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+
+class FakeServices:
+    """One local HTTP server standing in for NewsAPI, OpenAI, Blogger and article/image hosts.
+
+    Requests are routed by path:
+      /v2/top-headlines, /v2/everything  NewsAPI
+      /v1/chat/completions               OpenAI chat completions
+      /v3/blogs/<id>/posts               Blogger posts
+      /articles/<n>, /images/<n>.jpg     article pages and images
+    """
+
+    def __init__(self, config=None, articles_per_feed=20, broken_image_rate=0.2, seed=1):
+        self.config = config or {}
+        self.articles_per_feed = articles_per_feed
+        self.broken_image_rate = broken_image_rate
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        self.posts = 0
+        self.generation = 0
+        self.epoch = time.time() - 12 * 3600
+        self.server = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                services.handle(self, 'GET')
+
+            def do_HEAD(self):
+                services.handle(self, 'HEAD')
+
+            def do_POST(self):
+                services.handle(self, 'POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='fake-services', daemon=True).start()
+        return self
+
+    def next_generation(self):
+        """Publish a fresh set of stories, as between two real fetch cycles."""
+        self.generation += 1
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _service_for(self, path):
+        if path.startswith('/v2/'):
+            return 'newsapi'
+        if path.startswith('/v1/'):
+            return 'openai'
+        if path.startswith('/v3/'):
+            return 'blogger'
+        if path.startswith('/images/'):
+            return 'images'
+        return 'articles'
+
+    def _roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def handle(self, handler, method):
+        parts = urlsplit(handler.path)
+        service = self._service_for(parts.path)
+        with self.lock:
+            self.requests[service] += 1
+        config = self.config.get(service) or ServiceConfig()
+
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+
+        if config.latency:
+            time.sleep(config.latency * self.random.uniform(0.5, 1.5))
+        if self._roll(config.rate_limit_rate):
+            return self._send(handler, method, 429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                              {'Retry-After': str(config.retry_after), 'x-ratelimit-remaining-requests': '0',
+                               'x-ratelimit-reset-requests': f"{config.retry_after}s"})
+        if self._roll(config.error_rate):
+            return self._send(handler, method, 500, {'error': {'message': 'Internal error', 'type': 'server_error'}})
+
+        route = getattr(self, f"_{service}")
+        route(handler, method, parts, body)
+
+    def _send(self, handler, method, status, payload, headers=None, content_type='application/json'):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        if method != 'HEAD':
+            handler.wfile.write(data)
+
+    def _published(self, generation, i):
+        # Every generation is ten minutes newer than the last, newest article first
+        published = self.epoch + generation * 600 + (self.articles_per_feed - i) * 10
+        return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(published))
+
+    def _newsapi(self, handler, method, parts, body):
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if parts.path.endswith('/everything'):
+            feed = params.get('q', '')
+        else:
+            feed = f"{params.get('country', 'us')}-{params.get('category', 'general')}"
+
+        # The feed holds the current and the previous generation of stories;
+        # the same stories appear in several feeds, sometimes from another outlet
+        articles = []
+        for generation in range(self.generation, max(self.generation - 2, -1), -1):
+            for i in range(self.articles_per_feed):
+                story = generation * 1000 + (sum(map(ord, feed)) + i) % (len(TOPICS) * 3)
+                topic = TOPICS[story % len(TOPICS)]
+                source = SOURCES[(story + i) % len(SOURCES)]
+                published = self._published(generation, i)
+                articles.append({
+                    'source': {'id': None, 'name': source},
+                    'author': 'Staff',
+                    'title': f"Researchers report breakthrough in {topic} study {story} - {source}",
+                    'description': f"A new {topic} result could change how scientists think about story {story}.",
+                    'url': f"{self.base_url}/articles/{story}?utm_source={feed}",
+                    'urlToImage': f"{self.base_url}/images/{story}.jpg",
+                    'publishedAt': published,
+                    'content': f"Scientists working on {topic} announced results on {published}. [+1200 chars]"
+                })
+        if params.get('from'):
+            articles = [article for article in articles if article['publishedAt'] >= params['from']]
+
+        page_size = min(int(params.get('pageSize', 20)), 100)
+        page = int(params.get('page', 1))
+        self._send(handler, method, 200, {
+            'status': 'ok',
+            'totalResults': len(articles),
+            'articles': articles[(page - 1) * page_size:page * page_size]
+        })
+
+    def _openai(self, handler, method, parts, body):
+        request = json.loads(body or b'{}')
+        prompt = ' '.join(m.get('content', '') for m in request.get('messages', []))
+        title = "A closer look at the latest discovery"
+        html = f"<h1>{title}</h1>" + "".join(f"<h2>Section {i}</h2><p>{'Lorem ipsum dolor sit amet. ' * 20}</p>"
+                                             for i in range(4))
+        arguments = json.dumps({'title': title, 'html': html, 'meta_description': "What the new study means."})
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(arguments) // 4
+        self._send(handler, method, 200, {
+            'id': 'chatcmpl-bench',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': None,
+                            'function_call': {'name': 'publish_article', 'arguments': arguments}},
+                'finish_reason': 'function_call'
+            }],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        }, {
+            'x-ratelimit-limit-requests': '500', 'x-ratelimit-remaining-requests': '499',
+            'x-ratelimit-limit-tokens': '100000', 'x-ratelimit-remaining-tokens': '99000',
+            'x-ratelimit-reset-requests': '120ms', 'x-ratelimit-reset-tokens': '600ms'
+        })
+
+    def _blogger(self, handler, method, parts, body):
+        post = json.loads(body or b'{}')
+        with self.lock:
+            self.posts += 1
+            post_id = str(self.posts)
+        post.update({'kind': 'blogger#post', 'id': post_id, 'url': f"{self.base_url}/posts/{post_id}"})
+        self._send(handler, method, 200, post)
+
+    def _articles(self, handler, method, parts, body):
+        story = parts.path.rsplit('/', 1)[-1]
+        paragraphs = ''.join(f"<p>Paragraph {i} of story {story}. {'Detail. ' * 30}</p>" for i in range(12))
+        html = (f"<html><head><title>Story {story}</title>"
+                f"<meta property=\"og:image\" content=\"/images/{story}.jpg\">"
+                f"<link rel=\"canonical\" href=\"/articles/{story}\"></head>"
+                f"<body><img src=\"/static/logo.png\"><article>{paragraphs}"
+                f"<img src=\"/images/{story}-inline.jpg\" width=\"800\" height=\"450\"></article></body></html>")
+        self._send(handler, method, 200, html.encode(), content_type='text/html; charset=utf-8')
+
+    def _images(self, handler, method, parts, body):
+        if self._roll(self.broken_image_rate):
+            return self._send(handler, method, 404, b'', content_type='text/plain')
+        self._send(handler, method, 200, b'\xff\xd8\xff' + b'\0' * 2048, content_type='image/jpeg')
@@ -0,0 +1,81 @@
+"""Measure how long the bot's entry points take to import in a fresh interpreter.
+
+Usage:
+    python benchmarks/import_time.py --runs 10
+    python benchmarks/import_time.py --budget-ms 50
+    python benchmarks/import_time.py --detail news_aggregator
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules to time; the light ones back the status and health commands and
+# must stay within the budget
+LIGHT_MODULES = ['newsbot.cli', 'check_status']
+HEAVY_MODULES = ['news_aggregator', 'openai_dispatcher']
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Time the imports of the bot's entry points")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument('--budget-ms', type=float, help="fail if a light module takes longer to import")
+    parser.add_argument('--detail', metavar='MODULE', help="list the slowest imports of one module")
+    return parser.parse_args(argv)
+
+def time_command(code, runs):
+    """Return the median wall time in milliseconds of running `code` in a new interpreter, or None if it fails."""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return None
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+def slowest_imports(module, count=15):
+    """Return the `count` imports of `module` with the largest cumulative time, from python -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=REPO_ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.detail:
+        for cumulative, name in slowest_imports(args.detail):
+            print(f"{cumulative:>9.1f} ms  {name}")
+        return 0
+
+    baseline = time_command('pass', args.runs)
+    print(f"Interpreter startup: {baseline:.1f} ms")
+    print("Import time over startup (median ms):")
+    over_budget = []
+    for module in LIGHT_MODULES + HEAVY_MODULES:
+        elapsed = time_command(f"import {module}", args.runs)
+        if elapsed is None:
+            print(f"  {module:<20} failed (missing dependency?)")
+            continue
+        elapsed -= baseline
+        print(f"  {module:<20} {elapsed:>8.1f}")
+        if args.budget_ms is not None and module in LIGHT_MODULES and elapsed > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over the {args.budget_ms:g} ms budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Run process_news end to end against local fake services and report its performance.
+
+Usage:
+    python benchmarks/run_benchmark.py --cycles 3 --save baseline.json
+    python benchmarks/run_benchmark.py --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from fake_services import FakeServices, ServiceConfig
+
+SERVICES = ['newsapi', 'articles', 'images', 'openai', 'blogger']
+FUNCTIONS = ['process_news', 'fetch_science_tech_news', 'extract_article_content',
+             'rewrite_with_ai', 'get_image_from_article', 'post_to_blogger']
+
+# Results where a larger value is better; for all others smaller is better
+HIGHER_IS_BETTER = {'articles_per_minute'}
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the news bot against local fake services")
+    parser.add_argument('--cycles', type=int, default=3, help="processing cycles to run")
+    parser.add_argument('--articles-per-feed', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help="base latency of every service in seconds")
+    parser.add_argument('--openai-latency', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument('--broken-image-rate', type=float, default=0.2)
+    parser.add_argument('--max-posts', type=int, default=1000, help="MAX_POSTS_PER_CYCLE for the run")
+    parser.add_argument('--targets', type=int, default=1, help="number of blog targets to serve")
+    parser.add_argument('--save', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='FILE', help="fail if results regressed against a saved run")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative regression")
+    return parser.parse_args(argv)
+
+def configure_environment(base_url, args):
+    """Point the bot at the fake services before news_aggregator is imported."""
+    os.environ.update({
+        'NEWS_API_KEY': 'bench',
+        'OPENAI_API_KEY': 'bench',
+        'BLOG_ID': 'bench',
+        'NEWS_API_BASE': f"{base_url}/v2",
+        'OPENAI_API_BASE': f"{base_url}/v1",
+        'BLOGGER_API_ENDPOINT': f"{base_url}/",
+        'WORKER_ID': 'bench',
+        'METRICS_PORT': '0',
+        'PUBLISH_INTERVAL': '0',
+        'NEWS_CACHE_TTL': '0',
+        'NEWS_API_RATE': '1000',
+        'NEWS_API_BURST': '1000',
+        'TOKEN_COUNTING': 'estimate',
+        'MAX_POSTS_PER_CYCLE': str(args.max_posts)
+    })
+
+def write_targets(count):
+    """Write a targets file with `count` blogs, each following a few countries of one category."""
+    countries = ['us', 'gb', 'au', 'ca', 'in', 'sg', 'jp']
+    categories = ['science', 'technology']
+    targets = [{
+        'name': f"blog-{i}",
+        'blog_id': f"bench-{i}",
+        'countries': [countries[(i + k) % len(countries)] for k in range(3)],
+        'categories': [categories[i % len(categories)]]
+    } for i in range(count)]
+    with open('targets.json', 'w') as f:
+        json.dump(targets, f, indent=2)
+
+def load_bot():
+    """Import news_aggregator with Blogger publishers that need no OAuth token."""
+    from google.auth.credentials import AnonymousCredentials
+
+    sys.path.insert(0, REPO_ROOT)
+    import news_aggregator
+
+    news_aggregator.configure_logging()
+    for target in news_aggregator.load_all_targets():
+        news_aggregator._publishers[target.blog_id] = news_aggregator.BloggerPublisher(
+            target.blog_id, None, None, news_aggregator.SCOPES,
+            api_endpoint=news_aggregator.BLOGGER_API_ENDPOINT, credentials=AnonymousCredentials()
+        )
+    return news_aggregator
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run(args):
+    service_config = {name: ServiceConfig(args.latency, args.error_rate, args.rate_limit_rate)
+                      for name in SERVICES}
+    service_config['openai'].latency = args.openai_latency
+    services = FakeServices(service_config, args.articles_per_feed, args.broken_image_rate).start()
+
+    workdir = tempfile.mkdtemp(prefix='newsbot-bench-')
+    os.chdir(workdir)
+    configure_environment(services.base_url, args)
+    if args.targets > 1:
+        write_targets(args.targets)
+    bot = load_bot()
+
+    posted = 0
+    started = time.monotonic()
+    try:
+        for _ in range(args.cycles):
+            posted += bot.process_news()
+            services.next_generation()
+    finally:
+        elapsed = time.monotonic() - started
+        services.stop()
+
+    latency = {}
+    for function in FUNCTIONS:
+        p50 = bot.CALL_DURATION.quantile(0.5, function=function)
+        p99 = bot.CALL_DURATION.quantile(0.99, function=function)
+        if p50 is not None:
+            latency[function] = {'p50': round(p50, 4), 'p99': round(p99, 4)}
+
+    return {
+        'cycles': args.cycles,
+        'targets': args.targets,
+        'articles_posted': posted,
+        'elapsed_seconds': round(elapsed, 2),
+        'articles_per_minute': round(posted / elapsed * 60, 2) if elapsed else 0,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'latency': latency,
+        'requests': dict(services.requests),
+        'workdir': workdir
+    }
+
+def flatten(results):
+    """Return the comparable numbers of a result set keyed by a dotted name."""
+    values = {name: results[name] for name in ('articles_per_minute', 'peak_rss_mb')}
+    for function, quantiles in results['latency'].items():
+        for quantile, value in quantiles.items():
+            values[f"latency.{function}.{quantile}"] = value
+    for service, count in results['requests'].items():
+        values[f"requests.{service}"] = count
+    return values
+
+def compare(results, baseline, tolerance):
+    """Return a description of every value that regressed by more than `tolerance`."""
+    current = flatten(results)
+    regressions = []
+    for name, before in flatten(baseline).items():
+        after = current.get(name)
+        if after is None or not before:
+            continue
+        change = (after - before) / before
+        if name in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{name}: {before} -> {after} ({change:+.0%})")
+    return regressions
+
+def print_report(results):
+    print(f"Posted {results['articles_posted']} articles in {results['cycles']} cycles "
+          f"({results['elapsed_seconds']}s, {results['articles_per_minute']} articles/min)")
+    print(f"Peak RSS: {results['peak_rss_mb']} MB")
+    print("Latency (p50 / p99 seconds):")
+    for function, quantiles in results['latency'].items():
+        print(f"  {function:<26} {quantiles['p50']:>8.3f} / {quantiles['p99']:.3f}")
+    print("Requests per service:")
+    for service in SERVICES:
+        print(f"  {service:<26} {results['requests'].get(service, 0)}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    save_path = os.path.abspath(args.save) if args.save else None
+
+    results = run(args)
+    print_report(results)
+    if not results['articles_posted']:
+        print(f"No articles were posted; see news_bot.log in {results['workdir']}")
+        return 1
+
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {save_path}")
+
+    if compare_path:
+        with open(compare_path) as f:
+            baseline = json.load(f)
+        if not baseline.get('articles_posted'):
+            print(f"Baseline {compare_path} posted no articles and cannot be compared against")
+            return 1
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
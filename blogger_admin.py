@@ -0,0 +1,136 @@
+"""Bulk Blogger operations using batched API calls.
+
+Usage:
+    python blogger_admin.py backfill --limit 100
+    python blogger_admin.py relabel --add Science --remove News
+    python blogger_admin.py --dry-run fix-meta
+"""
+import argparse
+import html
+import re
+import sys
+
+META_PATTERN = re.compile(r'<!--\s*meta-description:')
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+def meta_description(content, limit=155):
+    """Derive a meta description from the start of a post's text, cut at a word boundary."""
+    text = ' '.join(html.unescape(TAG_PATTERN.sub(' ', content or '')).split())
+    if len(text) > limit:
+        text = text[:limit].rsplit(' ', 1)[0].rstrip(',;:') + '...'
+    # '--' would end the HTML comment the description is stored in
+    return text.replace('--', '-')
+
+def select_target(bot, name):
+    targets = {target.name: target for target in bot.load_all_targets()}
+    if name is None:
+        name = next(iter(targets))
+    if name not in targets:
+        raise SystemExit(f"Unknown target {name}; known targets: {', '.join(targets)}")
+    return targets[name]
+
+def backfill(bot, target, limit, dry_run):
+    """Publish up to `limit` ready jobs of `target` at once instead of one per publish slot."""
+    state = bot.BotState(targets=[target])
+    jobs = []
+    while len(jobs) < limit:
+        job = state.job_queue.claim(bot.WORKER_ID, states=[bot.STATES[-2]], targets=[target.name])
+        if job is None:
+            break
+        jobs.append(job)
+    if dry_run or not jobs:
+        for job in jobs:
+            print(f"Would publish: {job['article']['rewritten']['title']}")
+            state.job_queue.release(job, bot.WORKER_ID)
+        print(f"{len(jobs)} ready articles for {target.name}")
+        return 0
+
+    bodies = [bot.build_post_body(job['article']['rewritten'], job['article']['image_url'], target) for job in jobs]
+    results = bot.get_blogger_publisher(target.blog_id).insert_posts(bodies)
+    failed = 0
+    for index, job in enumerate(jobs):
+        post, error = results[index]
+        if error is not None:
+            failed += 1
+            bot.FAILURES.inc(stage='publish', reason=type(error).__name__)
+            print(f"Error posting {job['article']['rewritten']['title']}: {error}", file=sys.stderr)
+            state.job_queue.fail(job, "published stage failed", bot.WORKER_ID)
+            continue
+        bot.ARTICLES.inc(outcome='posted', target=target.name)
+        bot.record_published(job['article'], state)
+        state.job_queue.advance(job, bot.STATES[-1], bot.WORKER_ID)
+    print(f"Published {len(jobs) - failed} of {len(jobs)} articles to {target.blog_id}")
+    return 1 if failed else 0
+
+def patch_posts(publisher, patches, dry_run):
+    """Apply `patches` ({post_id: partial post}) in batch calls and report the outcome."""
+    if dry_run or not patches:
+        print(f"{len(patches)} posts to update")
+        return 0
+    results = publisher.patch_posts(patches)
+    errors = {post_id: error for post_id, (_, error) in results.items() if error is not None}
+    for post_id, error in errors.items():
+        print(f"Error updating post {post_id}: {error}", file=sys.stderr)
+    print(f"Updated {len(patches) - len(errors)} of {len(patches)} posts")
+    return 1 if errors else 0
+
+def relabel(bot, target, add, remove, only_label, limit, dry_run):
+    """Add and remove labels on the target's posts, optionally only those carrying `only_label`."""
+    publisher = bot.get_blogger_publisher(target.blog_id)
+    patches = {}
+    for post in publisher.list_posts(labels=[only_label] if only_label else None, limit=limit):
+        labels = post.get('labels', [])
+        updated = [label for label in labels if label not in remove]
+        updated += [label for label in add if label not in updated]
+        if updated != labels:
+            patches[post['id']] = {'labels': updated}
+            if dry_run:
+                print(f"{post['title']}: {', '.join(labels)} -> {', '.join(updated)}")
+    return patch_posts(publisher, patches, dry_run)
+
+def fix_meta(bot, target, limit, dry_run):
+    """Give every post of the target without a meta description comment one derived from its text."""
+    publisher = bot.get_blogger_publisher(target.blog_id)
+    patches = {}
+    for post in publisher.list_posts(fetch_bodies=True, limit=limit):
+        content = post.get('content', '')
+        if META_PATTERN.search(content):
+            continue
+        description = meta_description(content)
+        if not description:
+            continue
+        patches[post['id']] = {'content': f'<!-- meta-description: {description} -->\n{content}'}
+        if dry_run:
+            print(f"{post['title']}: {description}")
+    return patch_posts(publisher, patches, dry_run)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish and maintain Blogger posts in bulk.")
+    parser.add_argument('--target', help="blog target to work on (default: the first configured)")
+    parser.add_argument('--dry-run', action='store_true', help="show what would change without calling Blogger")
+    commands = parser.add_subparsers(dest='command', required=True)
+    backfill_parser = commands.add_parser('backfill', help="publish ready articles now, in batches")
+    backfill_parser.add_argument('--limit', type=int, default=50)
+    relabel_parser = commands.add_parser('relabel', help="add or remove labels on existing posts")
+    relabel_parser.add_argument('--add', action='append', default=[], metavar='LABEL')
+    relabel_parser.add_argument('--remove', action='append', default=[], metavar='LABEL')
+    relabel_parser.add_argument('--only-label', metavar='LABEL', help="only change posts with this label")
+    relabel_parser.add_argument('--limit', type=int, help="posts to look at, newest first")
+    fix_meta_parser = commands.add_parser('fix-meta', help="add missing meta descriptions to existing posts")
+    fix_meta_parser.add_argument('--limit', type=int, help="posts to look at, newest first")
+    args = parser.parse_args(argv)
+
+    import news_aggregator as bot
+
+    bot.configure_logging()
+    target = select_target(bot, args.target)
+    if args.command == 'backfill':
+        return backfill(bot, target, args.limit, args.dry_run)
+    if args.command == 'relabel':
+        if not args.add and not args.remove:
+            parser.error("relabel needs --add or --remove")
+        return relabel(bot, target, args.add, args.remove, args.only_label, args.limit, args.dry_run)
+    return fix_meta(bot, target, args.limit, args.dry_run)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import logging
+import os
+import pickle
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Sub-requests per batch call and HTTP statuses worth another attempt
+BATCH_SIZE = 50
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# A post insert that failed with a server error, a timeout or a reset
+# connection may still have created the post, so inserts are only retried
+# after rate limiting and errors raised before the request went out
+INSERT_RETRYABLE_STATUSES = {429}
+CONNECTION_ERRORS = (ConnectionError, TimeoutError, socket.timeout)
+
+def unsent_errors():
+    """Return the errors raised before a request reaches the server: connection refused and DNS failures."""
+    from httplib2 import ServerNotFoundError
+
+    return (ConnectionRefusedError, socket.gaierror, ServerNotFoundError)
+
+def is_retryable(error, statuses, errors=CONNECTION_ERRORS):
+    """Return whether a failed call is worth another attempt: an HTTP error in `statuses` or one of `errors`."""
+    from googleapiclient.errors import HttpError
+
+    if isinstance(error, HttpError):
+        return error.resp.status in statuses
+    return isinstance(error, errors)
+
+class BloggerPublisher:
+    """Long-lived Blogger client that caches credentials and the built API service.
+
+    The service is built once from the discovery document bundled with
+    google-api-python-client, so no discovery request goes over the
+    network. The access token is refreshed `refresh_margin` ahead of its
+    expiry instead of failing a request first.
+    """
+
+    def __init__(self, blog_id, token_file, credentials_file, scopes, refresh_margin=timedelta(minutes=5),
+                 api_endpoint=None, credentials=None, num_retries=3):
+        self.blog_id = blog_id
+        self.token_file = token_file
+        self.credentials_file = credentials_file
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.api_endpoint = api_endpoint
+        self.num_retries = num_retries
+        self.lock = threading.RLock()
+        self._creds = credentials
+        self._service = None
+
+    def _save_credentials(self):
+        with open(self.token_file, 'wb') as token:
+            pickle.dump(self._creds, token)
+
+    def _load_credentials(self):
+        creds = None
+        if os.path.exists(self.token_file):
+            with open(self.token_file, 'rb') as token:
+                creds = pickle.load(token)
+
+        if not creds or not (creds.valid or creds.refresh_token):
+            from google_auth_oauthlib.flow import InstalledAppFlow
+
+            flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, self.scopes)
+            creds = flow.run_local_server(port=0)
+            self._creds = creds
+            self._save_credentials()
+        return creds
+
+    def _ensure_fresh(self):
+        """Refresh the access token if it expires within the refresh margin."""
+        if self._creds is None:
+            self._creds = self._load_credentials()
+
+        expiry = self._creds.expiry
+        expiring = expiry is not None and expiry - datetime.utcnow() < self.refresh_margin
+        if (expiring or not self._creds.valid) and getattr(self._creds, 'refresh_token', None):
+            from google.auth.transport.requests import Request
+
+            self._creds.refresh(Request())
+            self._save_credentials()
+            logging.info("Refreshed Blogger access token")
+
+    @property
+    def service(self):
+        """Return the cached Blogger API service, building it on first use."""
+        with self.lock:
+            self._ensure_fresh()
+            if self._service is None:
+                from googleapiclient.discovery import build
+
+                client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+                self._service = build('blogger', 'v3', credentials=self._creds, client_options=client_options,
+                                      static_discovery=True, cache_discovery=False)
+            return self._service
+
+    def publish(self, post_body, backoff=2.0):
+        """Create a post in a single insert call and return the created post.
+
+        Only rate limiting and errors raised before the request went out
+        (connection refused, DNS failure) are retried, with jittered
+        backoff. Server errors, timeouts and reset connections are raised,
+        since the post may already exist and retrying could publish it twice.
+        """
+        retry_errors = unsent_errors()
+        for attempt in range(self.num_retries + 1):
+            try:
+                with self.lock:
+                    return self.service.posts().insert(blogId=self.blog_id, body=post_body).execute()
+            except Exception as e:
+                if attempt == self.num_retries or not is_retryable(e, INSERT_RETRYABLE_STATUSES, retry_errors):
+                    raise
+                delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                logging.warning(f"Retrying Blogger insert in {delay:.1f}s after {type(e).__name__}")
+                time.sleep(delay)
+
+    def execute_batch(self, requests, batch_size=BATCH_SIZE, max_retries=3, backoff=2.0,
+                      retry_statuses=RETRYABLE_STATUSES, retry_errors=CONNECTION_ERRORS):
+        """Run many API calls in batch HTTP requests of up to `batch_size` calls each.
+
+        `requests` maps a key to a function that builds the call from the
+        service. Calls that fail with a status in `retry_statuses` or an
+        error in `retry_errors`, alone or with their whole batch, are
+        retried in a later batch with jittered backoff. Returns {key: (response, error)}, with error None for
+        successful calls.
+        """
+        results = {}
+        pending = list(requests)
+        for attempt in range(max_retries + 1):
+            retry = []
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+
+                def callback(request_id, response, exception, chunk=chunk):
+                    key = chunk[int(request_id)]
+                    if exception is not None and is_retryable(exception, retry_statuses, retry_errors) and attempt < max_retries:
+                        retry.append(key)
+                    results[key] = (response, exception)
+
+                with self.lock:
+                    batch = self.service.new_batch_http_request(callback=callback)
+                    for index, key in enumerate(chunk):
+                        batch.add(requests[key](self.service), request_id=str(index))
+                    try:
+                        batch.execute()
+                    except Exception as e:
+                        # The whole batch call failed; every call in it gets another attempt if the error allows
+                        for key in chunk:
+                            results[key] = (None, e)
+                        if is_retryable(e, retry_statuses, retry_errors) and attempt < max_retries:
+                            retry.extend(key for key in chunk if key not in retry)
+
+            if not retry:
+                break
+            delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            logging.warning(f"Retrying {len(retry)} failed Blogger calls in {delay:.1f}s")
+            time.sleep(delay)
+            pending = retry
+        return results
+
+    def insert_posts(self, post_bodies, is_draft=False):
+        """Create many posts in batch calls; returns {index: (post, error)}.
+
+        Like `publish`, inserts are only retried after rate limiting and
+        errors raised before the batch was sent; a batch that timed out or
+        lost its connection is not sent again.
+        """
+        return self.execute_batch({
+            index: (lambda service, body=body: service.posts().insert(blogId=self.blog_id, body=body, isDraft=is_draft))
+            for index, body in enumerate(post_bodies)
+        }, retry_statuses=INSERT_RETRYABLE_STATUSES, retry_errors=unsent_errors())
+
+    def patch_posts(self, patches):
+        """Update fields of many posts ({post_id: partial post}) in batch calls; returns {post_id: (post, error)}."""
+        return self.execute_batch({
+            post_id: (lambda service, post_id=post_id, body=body:
+                      service.posts().patch(blogId=self.blog_id, postId=post_id, body=body))
+            for post_id, body in patches.items()
+        })
+
+    def list_posts(self, labels=None, fetch_bodies=False, limit=None):
+        """Yield the blog's posts, newest first, 500 per request.
+
+        Only the id, title, labels, URL and (with `fetch_bodies`) content of each post are requested.
+        """
+        fields = 'nextPageToken,items(id,title,labels,url' + (',content)' if fetch_bodies else ')')
+        page_token = None
+        count = 0
+        while True:
+            with self.lock:
+                response = self.service.posts().list(
+                    blogId=self.blog_id, labels=','.join(labels) if labels else None, maxResults=500,
+                    pageToken=page_token, fetchBodies=fetch_bodies, fields=fields
+                ).execute(num_retries=self.num_retries)
+            for post in response.get('items', []):
+                yield post
+                count += 1
+                if limit and count >= limit:
+                    return
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return
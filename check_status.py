@@ -1,26 +1,49 @@
 import os
-import pickle
+import glob
+import json
 import logging
 from datetime import datetime, timedelta
+from heartbeat import read_heartbeat
+from metrics import load_snapshot, snapshot_value
 
-def check_bot_status():
-    """Check the status of the news bot."""
-    print("Science and Technology News Bot Status Check")
-    print("===========================================")
-    
-    # Check log file
-    if os.path.exists("news_bot.log"):
-        with open("news_bot.log", "r") as f:
-            log_lines = f.readlines()
-            
-        if log_lines:
-            last_log = log_lines[-1]
-            print(f"Last log entry: {last_log.strip()}")
+def read_last_line(path, block_size=4096):
+    """Return the last non-empty line of a file, reading backwards from its end."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+            lines = data.rstrip(b'\r\n').split(b'\n')
+            if lines[-1] and (len(lines) > 1 or position == 0):
+                return lines[-1].decode('utf-8', errors='replace').strip()
+    return None
+
+def parse_log_time(line):
+    """Parse the timestamp of a text or JSON-lines log entry."""
+    if line.startswith('{'):
+        log_time_str = json.loads(line)['time']
+    else:
+        log_time_str = line.split(" - ")[0]
+    return datetime.strptime(log_time_str, "%Y-%m-%d %H:%M:%S,%f")
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S") if timestamp else "never"
+
+def print_log(path):
+    """Print the last entry of one log file and how long ago it was written."""
+    if os.path.exists(path):
+        last_log = read_last_line(path)
+        
+        if last_log:
+            print(f"\nLast log entry ({path}): {last_log}")
             
             # Parse the timestamp from the log
             try:
-                log_time_str = last_log.split(" - ")[0]
-                log_time = datetime.strptime(log_time_str, "%Y-%m-%d %H:%M:%S,%f")
+                log_time = parse_log_time(last_log)
                 time_diff = datetime.now() - log_time
                 
                 print(f"Time since last activity: {time_diff}")
@@ -32,16 +55,71 @@ def check_bot_status():
             except Exception as e:
                 print(f"Could not parse log timestamp: {e}")
     else:
-        print("No log file found. Bot may not have run yet.")
-    
-    # Check processed articles
-    if os.path.exists("processed_articles.pkl"):
-        with open("processed_articles.pkl", "rb") as f:
-            processed_articles = pickle.load(f)
-        
-        print(f"Number of processed articles: {len(processed_articles)}")
+        print(f"\nNo log file found at {path}. Bot may not have run yet.")
+
+def print_heartbeat(path):
+    """Print the status recorded in one heartbeat file."""
+    heartbeat = read_heartbeat(path)
+    if heartbeat:
+        print(f"\nBot status ({path}): {heartbeat.get('status', 'unknown')} (worker {heartbeat.get('worker_id')}, pid {heartbeat.get('pid')})")
+        print(f"Last heartbeat: {format_time(heartbeat.get('updated_at'))}")
+        if datetime.now() - datetime.fromtimestamp(heartbeat.get('updated_at', 0)) > timedelta(minutes=5):
+            print("WARNING: No heartbeat for more than 5 minutes. The bot process may have stopped.")
+        if heartbeat.get('last_poll'):
+            print(f"Last feed poll: {format_time(heartbeat.get('last_poll'))}, "
+                  f"next poll: {format_time(heartbeat.get('next_poll'))}")
+        if heartbeat.get('cycle_started'):
+            print(f"Last cycle: started {format_time(heartbeat.get('cycle_started'))}, "
+                  f"finished {format_time(heartbeat.get('cycle_finished'))}, "
+                  f"posted {heartbeat.get('last_cycle_posted', 0)} articles")
+        print(f"Number of processed articles: {heartbeat.get('processed_articles', 0)}")
+        if heartbeat.get('jobs'):
+            print(f"Job queue: {heartbeat['jobs']}")
+    else:
+        print(f"\nNo heartbeat file found at {path}. Bot may not have run yet.")
+
+def print_metrics(path):
+    """Print the counters and latencies of one metrics snapshot."""
+    snapshot = load_snapshot(path)
+    if snapshot:
+        duration = 'newsbot_call_duration_seconds'
+        print(f"\nMetrics from {path} (since bot start, saved {datetime.fromtimestamp(snapshot['timestamp'])}):")
+        for outcome in ('fetched', 'deduped', 'queued', 'rewritten', 'posted'):
+            print(f"  Articles {outcome}: {snapshot_value(snapshot, 'newsbot_articles_total', outcome=outcome)}")
+        print(f"  Failures: {snapshot_value(snapshot, 'newsbot_failures_total')}")
+        print(f"  OpenAI tokens: {snapshot_value(snapshot, 'newsbot_openai_tokens_total', kind='prompt')} prompt, "
+              f"{snapshot_value(snapshot, 'newsbot_openai_tokens_total', kind='completion')} completion")
+        for function in ('process_news', 'rewrite_with_ai', 'post_to_blogger'):
+            p50 = snapshot_value(snapshot, duration, 'p50', function=function)
+            p99 = snapshot_value(snapshot, duration, 'p99', function=function)
+            print(f"  {function}: p50 {p50:.1f}s, p99 {p99:.1f}s")
+        for cache in ('http', 'rewrite'):
+            print(f"  {cache} cache hit ratio: {snapshot_value(snapshot, 'newsbot_cache_hit_ratio', cache=cache):.0%}")
     else:
-        print("No processed articles file found.")
+        print(f"No metrics snapshot found at {path}.")
+
+def shard_files(prefix, extension=".json"):
+    """Return every existing single-process and shard file of a kind, or the single-process file if there are none.
+
+    Files left behind by an earlier sharded or single-process run are
+    listed with their age instead of hiding the live ones.
+    """
+    paths = [path for path in [f"{prefix}{extension}"] + sorted(glob.glob(f"{prefix}-*{extension}"))
+             if os.path.exists(path)]
+    return paths or [f"{prefix}{extension}"]
+
+def check_bot_status():
+    """Check the status of the news bot."""
+    print("Science and Technology News Bot Status Check")
+    print("===========================================")
+    
+    # Check the log, heartbeat and metrics written by the bot (one set per shard)
+    for path in shard_files("news_bot", ".log"):
+        print_log(path)
+    for path in shard_files("heartbeat"):
+        print_heartbeat(path)
+    for path in shard_files("metrics"):
+        print_metrics(path)
     
     print("\nTo restart the bot, run: python run_as_service.py")
 
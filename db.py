@@ -0,0 +1,12 @@
+import sqlite3
+
+def connect(path, timeout=30):
+    """Open a SQLite connection in WAL mode that can be shared between threads.
+
+    The connection runs in autocommit mode; callers that need several
+    statements to be atomic wrap them in an explicit BEGIN/COMMIT.
+    """
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
@@ -0,0 +1,51 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import db
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+def parse_published(value):
+    """Parse a NewsAPI publishedAt value into a naive UTC datetime, or None."""
+    if not value:
+        return None
+    try:
+        published = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    if published.tzinfo:
+        published = published.astimezone(timezone.utc).replace(tzinfo=None)
+    return published.replace(microsecond=0)
+
+def format_timestamp(published):
+    return published.strftime(TIMESTAMP_FORMAT)
+
+class FeedState:
+    """Per-feed watermark: the publishedAt of the newest article seen in each feed."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = db.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS feed_state (
+                feed TEXT PRIMARY KEY,
+                watermark TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def watermarks(self):
+        """Return the watermark of every feed as a {feed: timestamp} dict."""
+        with self.lock:
+            return dict(self.conn.execute('SELECT feed, watermark FROM feed_state').fetchall())
+
+    def advance(self, feed, published):
+        """Move the watermark of `feed` forward to `published`; it never moves back."""
+        watermark = format_timestamp(published)
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO feed_state (feed, watermark, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (feed) DO UPDATE SET
+                    watermark = MAX(watermark, excluded.watermark), updated_at = excluded.updated_at
+            """, (feed, watermark, time.time()))
@@ -0,0 +1,25 @@
+import json
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+
+def write_heartbeat(path, **fields):
+    """Merge `fields` into the heartbeat file and stamp it, replacing it atomically."""
+    with _lock:
+        heartbeat = read_heartbeat(path) or {}
+        heartbeat.update(fields)
+        heartbeat['updated_at'] = time.time()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(heartbeat, f, indent=2)
+        os.replace(tmp_path, path)
+
+def read_heartbeat(path):
+    """Return the heartbeat written by the bot, or None if there is none."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+from urllib.parse import urlencode
+
+import db
+
+# Query parameters that must never end up in a cache key
+SENSITIVE_PARAMS = {'apiKey', 'api_key', 'key'}
+
+def content_encoding(headers, default='utf-8'):
+    """Return the charset declared in a Content-Type header, or `default`."""
+    content_type = headers.get('Content-Type', '')
+    if 'charset=' in content_type:
+        return content_type.split('charset=')[-1].split(';')[0].strip().strip('"') or default
+    return default
+
+def requests_made(response):
+    """Return how many requests went out for `response`, counting the retries made by urllib3."""
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    return 1 + len(getattr(retries, 'history', None) or ())
+
+class CachedResponse:
+    """Minimal response object returned by HTTPCache.get().
+
+    `from_cache` is set when the body came from the cache, including after a
+    304 revalidation; `network_requests` counts the requests that went out
+    to get it (0 for a fresh cache hit), for callers that meter API usage.
+    """
+
+    def __init__(self, url, status_code, headers, content, from_cache=False, network_requests=0):
+        from requests.structures import CaseInsensitiveDict
+
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+        self.network_requests = network_requests
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self):
+        try:
+            return self.content.decode(content_encoding(self.headers), errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+class HTTPCache:
+    """Persistent HTTP GET cache with TTLs, conditional revalidation and LRU eviction."""
+
+    def __init__(self, path, max_bytes=100 * 1024 * 1024, default_ttl=3600):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.conn = db.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS http_cache_lru ON http_cache (last_access)')
+
+    @staticmethod
+    def cache_key(url, params=None):
+        """Build a cache key from the URL and its non-sensitive query parameters."""
+        if not params:
+            return url
+        safe = sorted((k, v) for k, v in params.items() if k not in SENSITIVE_PARAMS)
+        separator = '&' if '?' in url else '?'
+        return f"{url}{separator}{urlencode(safe)}"
+
+    def _lookup(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT status, headers, body, etag, last_modified, stored_at FROM http_cache WHERE key = ?',
+                (key,)
+            ).fetchone()
+        if not row:
+            return None
+        status, headers, body, etag, last_modified, stored_at = row
+        return {
+            'status': status,
+            'headers': json.loads(headers),
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': stored_at
+        }
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _touch(self, key, refreshed=False):
+        now = time.time()
+        with self.lock:
+            if refreshed:
+                self.conn.execute('UPDATE http_cache SET stored_at = ?, last_access = ? WHERE key = ?', (now, now, key))
+            else:
+                self.conn.execute('UPDATE http_cache SET last_access = ? WHERE key = ?', (now, key))
+
+    def _store(self, key, response, body):
+        if len(body) > self.max_bytes:
+            return
+        headers = {k: v for k, v in response.headers.items()
+                   if k.lower() in ('content-type', 'etag', 'last-modified', 'cache-control')}
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response.status_code, json.dumps(headers), body,
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 now, now, len(body))
+            )
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute('SELECT key, size FROM http_cache ORDER BY last_access').fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.conn.executemany('DELETE FROM http_cache WHERE key = ?', stale)
+
+    def get(self, session, url, params=None, ttl=None, limiter=None, read=None, **kwargs):
+        """GET `url` through the cache.
+
+        Fresh entries are returned without touching the network. Expired
+        entries are revalidated with If-None-Match/If-Modified-Since, so an
+        unchanged resource only costs a 304. `limiter` is only consulted
+        when a request actually goes out. With `read`, a 200 response is
+        streamed and `read(response)` returns the part of the body to keep,
+        so callers can stop downloading early.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        key = self.cache_key(url, params)
+        entry = self._lookup(key)
+
+        if entry and time.time() - entry['stored_at'] < ttl:
+            self._count('hits')
+            self._touch(key)
+            return CachedResponse(key, entry['status'], entry['headers'], entry['body'], from_cache=True)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        if limiter:
+            limiter.acquire()
+        response = session.get(url, params=params, headers=headers, stream=read is not None, **kwargs)
+        try:
+            if response.status_code == 304 and entry:
+                self._count('revalidated')
+                self._touch(key, refreshed=True)
+                return CachedResponse(key, entry['status'], entry['headers'], entry['body'], from_cache=True,
+                                      network_requests=requests_made(response))
+            body = read(response) if read and response.status_code == 200 else response.content
+        finally:
+            response.close()
+
+        self._count('misses')
+        if response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+            self._store(key, response, body)
+        return CachedResponse(key, response.status_code, dict(response.headers), body,
+                              network_requests=requests_made(response))
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        with self.lock:
+            entries, size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache').fetchone()
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.revalidated) / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': size
+        }
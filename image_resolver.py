@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import db
+from http_client import create_session
+
+# Filename fragments that mark site chrome rather than article images
+BLACKLIST = ('icon', 'logo', 'avatar', 'sprite', 'pixel', 'spacer', 'blank',
+             'placeholder', 'badge', 'button', 'emoji', 'tracking', 'banner-ad')
+
+# Images with a declared width below this are thumbnails or decorations
+MIN_WIDTH = 200
+
+def _size_hint(value):
+    try:
+        return int(str(value).strip().rstrip('px'))
+    except (TypeError, ValueError):
+        return None
+
+def _usable(url):
+    if not url or not url.startswith('http'):
+        return False
+    path = urlsplit(url).path.lower()
+    return not path.endswith('.svg') and not any(x in path for x in BLACKLIST)
+
+def rank_image_candidates(page):
+    """Order a page's image candidates from most to least promising.
+
+    og:image and twitter:image come first, then <img> tags by declared
+    size; tags declared smaller than MIN_WIDTH and blacklisted filenames
+    are dropped.
+    """
+    sized = []
+    for position, img in enumerate(page.images):
+        width = _size_hint(img.get('width'))
+        height = _size_hint(img.get('height'))
+        if width is not None and width < MIN_WIDTH:
+            continue
+        area = width * height if width and height else 0
+        sized.append((-area, position, img['src']))
+
+    ranked = []
+    for url in [page.og_image, page.twitter_image] + [src for _, _, src in sorted(sized)]:
+        if _usable(url) and url not in ranked:
+            ranked.append(url)
+    return ranked
+
+class ImageResolver:
+    """Probes image candidates concurrently and remembers which URLs and hosts work.
+
+    Probe results, including failures, are persisted with a TTL so known
+    good images are never probed twice and hosts that keep failing are
+    skipped without a request.
+    """
+
+    def __init__(self, path, probe_count=4, timeout=(3, 5), ok_ttl=7 * 86400,
+                 failure_ttl=86400, bad_host_failures=3):
+        self.probe_count = probe_count
+        self.timeout = timeout
+        self.ok_ttl = ok_ttl
+        self.failure_ttl = failure_ttl
+        self.bad_host_failures = bad_host_failures
+        self.session = create_session(pool_size=probe_count * 2, retries=0)
+        self.executor = ThreadPoolExecutor(max_workers=probe_count * 2, thread_name_prefix='image-probe')
+        self.lock = threading.Lock()
+        self.conn = db.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_probes (
+                url TEXT PRIMARY KEY,
+                host TEXT NOT NULL,
+                ok INTEGER NOT NULL,
+                checked_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_hosts (
+                host TEXT PRIMARY KEY,
+                successes INTEGER NOT NULL,
+                failures INTEGER NOT NULL,
+                checked_at REAL NOT NULL
+            )
+        """)
+
+    def _cached(self, url):
+        """Return True/False for a fresh cached probe result, or None if unknown."""
+        with self.lock:
+            row = self.conn.execute('SELECT ok, checked_at FROM image_probes WHERE url = ?', (url,)).fetchone()
+        if not row:
+            return None
+        ok, checked_at = row
+        ttl = self.ok_ttl if ok else self.failure_ttl
+        return bool(ok) if time.time() - checked_at < ttl else None
+
+    def _bad_host(self, host):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT successes, failures, checked_at FROM image_hosts WHERE host = ?', (host,)
+            ).fetchone()
+        if not row:
+            return False
+        successes, failures, checked_at = row
+        return (successes == 0 and failures >= self.bad_host_failures
+                and time.time() - checked_at < self.failure_ttl)
+
+    def _record(self, url, host, ok):
+        now = time.time()
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO image_probes VALUES (?, ?, ?, ?)', (url, host, int(ok), now))
+            row = self.conn.execute(
+                'SELECT successes, failures, checked_at FROM image_hosts WHERE host = ?', (host,)
+            ).fetchone()
+            successes, failures = 0, 0
+            if row and now - row[2] < self.failure_ttl:
+                successes, failures = row[0], row[1]
+            if ok:
+                successes += 1
+            else:
+                failures += 1
+            self.conn.execute('INSERT OR REPLACE INTO image_hosts VALUES (?, ?, ?, ?)', (host, successes, failures, now))
+
+    def _probe(self, url, host):
+        ok = False
+        try:
+            response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            if response.status_code in (403, 405, 501):
+                # Some image hosts refuse HEAD; fall back to a GET without reading the body
+                response = self.session.get(url, timeout=self.timeout, stream=True)
+                response.close()
+            content_type = response.headers.get('Content-Type', 'image/')
+            ok = response.status_code == 200 and content_type.startswith('image/')
+        except Exception as e:
+            logging.debug(f"Image probe failed for {url}: {str(e)}")
+        self._record(url, host, ok)
+        return ok
+
+    def resolve(self, candidates):
+        """Return the highest-ranked valid image among `candidates`, or None.
+
+        Unknown candidates among the top `probe_count` are probed in
+        parallel; lower-ranked probes never delay a better-ranked result.
+        """
+        checks = []
+        for url in candidates:
+            if len(checks) >= self.probe_count:
+                break
+            host = urlsplit(url).netloc.lower()
+            cached = self._cached(url)
+            if cached is False or (cached is None and self._bad_host(host)):
+                continue
+            if cached:
+                checks.append((url, None))
+            else:
+                checks.append((url, self.executor.submit(self._probe, url, host)))
+
+        for url, future in checks:
+            if future is None or future.result():
+                return url
+        return None
@@ -0,0 +1,228 @@
+import json
+import threading
+import time
+
+import db
+
+# Pipeline states in order; every article moves forward through them
+STATES = ['fetched', 'extracted', 'rewritten', 'imaged', 'published']
+FAILED = 'failed'
+TERMINAL_STATES = ('published', FAILED)
+
+_PROGRESS = 'CASE state ' + ' '.join(f"WHEN '{state}' THEN {i}" for i, state in enumerate(STATES)) + ' END'
+
+def state_index(state):
+    return STATES.index(state)
+
+def _to_signed(signature):
+    # SQLite integers are signed 64-bit, SimHash signatures unsigned
+    return signature - (1 << 64) if signature >= 1 << 63 else signature
+
+def _to_unsigned(signature):
+    return signature + (1 << 64) if signature < 0 else signature
+
+class JobQueue:
+    """Persistent per-article job table shared by all worker processes.
+
+    Each article has one row per blog it is queued for, recording the
+    last pipeline state it reached and the data produced so far. Workers
+    claim jobs with a lease, so a crashed worker's jobs become available
+    again once the lease runs out, and transitions only apply from the
+    expected state, so repeating one is a no-op.
+    """
+
+    def __init__(self, path, lease_seconds=300, retry_delay=900, max_attempts=3):
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = db.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                hash TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                article TEXT NOT NULL,
+                target TEXT NOT NULL DEFAULT 'default',
+                url_key TEXT,
+                signature INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                available_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                error TEXT
+            )
+        """)
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(jobs)')]
+        if 'target' not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN target TEXT NOT NULL DEFAULT 'default'")
+        if 'signature' not in columns:
+            self.conn.execute('ALTER TABLE jobs ADD COLUMN url_key TEXT')
+            self.conn.execute('ALTER TABLE jobs ADD COLUMN signature INTEGER')
+            self._backfill_signatures()
+        self.conn.execute('CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (state, available_at)')
+
+    def _backfill_signatures(self):
+        placeholders = ', '.join('?' * len(TERMINAL_STATES))
+        rows = self.conn.execute(
+            f'SELECT hash, article FROM jobs WHERE state NOT IN ({placeholders})', TERMINAL_STATES
+        ).fetchall()
+        for article_hash, article in rows:
+            article = json.loads(article)
+            if article.get('url_key') and article.get('simhash') is not None:
+                self.conn.execute('UPDATE jobs SET url_key = ?, signature = ? WHERE hash = ?',
+                                  (article['url_key'], _to_signed(article['simhash']), article_hash))
+
+    def enqueue(self, article_hash, article, batch_time=None, target='default'):
+        """Add a freshly fetched article for blog `target`; returns False if it already has a job.
+
+        Articles fetched together should share `batch_time` so that they
+        are claimed in the order they were enqueued.
+        """
+        now = time.time()
+        signature = article.get('simhash')
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT OR IGNORE INTO jobs (hash, state, article, target, url_key, signature, '
+                'available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (article_hash, STATES[0], json.dumps(article), target, article.get('url_key'),
+                 None if signature is None else _to_signed(signature), now, batch_time or now, now)
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, worker_id, states=None, targets=None):
+        """Lease the next available unfinished job to `worker_id`.
+
+        The most advanced jobs come first, then the newest batch in
+        enqueue order. `states` and `targets` limit the claim to jobs in
+        those states and for those blogs. Returns a job dict, or None when
+        no job is available.
+        """
+        if targets is not None and not targets:
+            return None
+        now = time.time()
+        states = states or [state for state in STATES if state not in TERMINAL_STATES]
+        conditions = [f"state IN ({', '.join('?' * len(states))})", 'available_at <= ?']
+        params = [*states, now]
+        if targets is not None:
+            conditions.append(f"target IN ({', '.join('?' * len(targets))})")
+            params.extend(targets)
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute(f"""
+                    SELECT hash, state, article FROM jobs
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY {_PROGRESS} DESC, created_at DESC, rowid
+                    LIMIT 1
+                """, params).fetchone()
+                if row:
+                    self.conn.execute(
+                        'UPDATE jobs SET owner = ?, available_at = ?, updated_at = ? WHERE hash = ?',
+                        (worker_id, now + self.lease_seconds, now, row[0])
+                    )
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        if not row:
+            return None
+        return {'hash': row[0], 'state': row[1], 'article': json.loads(row[2])}
+
+    def advance(self, job, state, worker_id):
+        """Move a claimed job to `state`, storing its article data and renewing the lease.
+
+        Returns False if the job is no longer held by `worker_id` or has
+        already left the state it was claimed in.
+        """
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute("""
+                UPDATE jobs SET state = ?, article = ?, available_at = ?, updated_at = ?, error = NULL
+                WHERE hash = ? AND state = ? AND owner = ?
+            """, (state, json.dumps(job['article']), now + self.lease_seconds, now,
+                  job['hash'], job['state'], worker_id))
+        if cursor.rowcount != 1:
+            return False
+        job['state'] = state
+        return True
+
+    def fail(self, job, reason, worker_id):
+        """Record a failed attempt; the job is retried later or given up after max_attempts."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("""
+                UPDATE jobs SET attempts = attempts + 1, error = ?, owner = NULL, available_at = ?, updated_at = ?,
+                    state = CASE WHEN attempts + 1 >= ? THEN ? ELSE state END
+                WHERE hash = ? AND owner = ?
+            """, (reason, now + self.retry_delay, now, self.max_attempts, FAILED, job['hash'], worker_id))
+
+    def release(self, job, worker_id):
+        """Give back a job `worker_id` holds so any worker can continue it right away."""
+        with self.lock:
+            self.conn.execute(
+                'UPDATE jobs SET owner = NULL, available_at = ? WHERE hash = ? AND owner = ?',
+                (time.time(), job['hash'], worker_id)
+            )
+
+    def release_all(self, worker_id):
+        """Give back every job `worker_id` holds so any worker can resume it.
+
+        A worker restarted under the same id calls this first to resume
+        its own jobs without waiting for their leases to expire.
+        """
+        with self.lock:
+            self.conn.execute(
+                'UPDATE jobs SET owner = NULL, available_at = ? WHERE owner = ? AND state NOT IN (?, ?)',
+                (time.time(), worker_id, *TERMINAL_STATES)
+            )
+
+    def backlog(self, state, worker_id, target='default'):
+        """Count `target` jobs waiting in `state` plus those `worker_id` is still moving towards it."""
+        earlier = STATES[:state_index(state)]
+        placeholders = ', '.join('?' * len(earlier))
+        with self.lock:
+            return self.conn.execute(f"""
+                SELECT COUNT(*) FROM jobs
+                WHERE target = ? AND (state = ? OR (state IN ({placeholders}) AND owner = ? AND available_at > ?))
+            """, (target, state, *earlier, worker_id, time.time())).fetchone()[0]
+
+    def expire(self, state, max_age):
+        """Fail unclaimed jobs still in `state` more than `max_age` seconds after they were fetched; returns how many."""
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = ?, error = 'expired', updated_at = ? "
+                "WHERE state = ? AND created_at < ? AND (owner IS NULL OR available_at <= ?)",
+                (FAILED, time.time(), state, time.time() - max_age, time.time())
+            )
+        return cursor.rowcount
+
+    def pending_signatures(self, target='default'):
+        """Return the (url_key, signature) pairs of `target` jobs that are still in progress."""
+        placeholders = ', '.join('?' * len(TERMINAL_STATES))
+        with self.lock:
+            rows = self.conn.execute(f"""
+                SELECT url_key, signature FROM jobs
+                WHERE target = ? AND state NOT IN ({placeholders}) AND signature IS NOT NULL
+            """, (target, *TERMINAL_STATES)).fetchall()
+        return [(url_key, _to_unsigned(signature)) for url_key, signature in rows]
+
+    def last_published_at(self, target='default'):
+        """Return when any worker last published a job for `target`, or None."""
+        with self.lock:
+            return self.conn.execute(
+                'SELECT MAX(updated_at) FROM jobs WHERE state = ? AND target = ?', (STATES[-1], target)
+            ).fetchone()[0]
+
+    def counts(self):
+        """Return the number of jobs in each state."""
+        with self.lock:
+            return dict(self.conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+
+    def prune(self, max_age):
+        """Delete finished, failed and never-started jobs not updated for `max_age` seconds."""
+        with self.lock:
+            self.conn.execute(
+                'DELETE FROM jobs WHERE state IN (?, ?, ?) AND updated_at < ?',
+                (*TERMINAL_STATES, STATES[0], time.time() - max_age)
+            )
@@ -0,0 +1,38 @@
+import json
+import logging
+from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+class JsonFormatter(logging.Formatter):
+    """Format each record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name,
+            'thread': record.threadName
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+def setup_logging(log_file, max_bytes=10 * 1024 * 1024, backup_count=5, when=None, json_format=False):
+    """Log to the console and to a rotating file.
+
+    The file rotates at `max_bytes`, or on the `when` schedule of
+    TimedRotatingFileHandler (e.g. 'midnight') if given, keeping
+    `backup_count` old files. With `json_format` the file gets JSON lines.
+    """
+    if when:
+        file_handler = TimedRotatingFileHandler(log_file, when=when, backupCount=backup_count)
+    else:
+        file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    logging.basicConfig(level=logging.INFO, handlers=[file_handler, console_handler])
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.lock = threading.Lock()
+        self.values = {}
+
+class Counter(Metric):
+    """Monotonically increasing count, optionally split by labels."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(_label_key(labels), 0)
+
+    def render(self):
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in sorted(self.values.items())]
+
+    def snapshot(self):
+        return [{'labels': dict(key), 'value': value} for key, value in sorted(self.values.items())]
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets, with approximate quantiles."""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            else:
+                series['counts'][-1] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def time(self, **labels):
+        """Decorator recording the wall time of each call."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.monotonic()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.monotonic() - started, **labels)
+            return wrapper
+        return decorator
+
+    def quantile(self, q, **labels):
+        """Estimate the q-quantile by interpolating inside the matching bucket."""
+        series = self.values.get(_label_key(labels))
+        if not series or not series['count']:
+            return None
+        rank = q * series['count']
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(series['counts']):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if count and seen + count >= rank:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.buckets[-1]
+
+    def render(self):
+        lines = []
+        for key, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+    def snapshot(self):
+        return [{
+            'labels': dict(key),
+            'count': series['count'],
+            'sum': round(series['sum'], 6),
+            'p50': self.quantile(0.5, **dict(key)),
+            'p99': self.quantile(0.99, **dict(key))
+        } for key, series in sorted(self.values.items())]
+
+class Registry:
+    """Collection of metrics that renders Prometheus text and JSON snapshots."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+
+    def _register(self, metric):
+        self.metrics.setdefault(metric.name, metric)
+        return self.metrics[metric.name]
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def add_collector(self, collector):
+        """Register a callable that refreshes gauges right before metrics are read."""
+        self.collectors.append(collector)
+
+    def _collect(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception:
+                pass
+
+    def render_prometheus(self):
+        self._collect()
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            with metric.lock:
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        self._collect()
+        data = {'timestamp': time.time(), 'metrics': {}}
+        for metric in self.metrics.values():
+            with metric.lock:
+                data['metrics'][metric.name] = {'type': metric.kind, 'series': metric.snapshot()}
+        return data
+
+    def write_snapshot(self, path):
+        """Atomically write a JSON snapshot to `path`."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+def start_server(registry, port, host='127.0.0.1'):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = registry.render_prometheus().encode()
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/metrics.json':
+                body = json.dumps(registry.snapshot()).encode()
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    return server
+
+def load_snapshot(path):
+    """Read a JSON snapshot written by Registry.write_snapshot(), or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def snapshot_value(snapshot, name, field='value', **labels):
+    """Sum `field` over the series of metric `name` whose labels include `labels`."""
+    metric = snapshot.get('metrics', {}).get(name)
+    if not metric:
+        return 0
+    return sum(series.get(field) or 0 for series in metric['series']
+               if all(series['labels'].get(k) == v for k, v in labels.items()))
@@ -0,0 +1,242 @@
+import hashlib
+import re
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import db
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'ref', 'ref_src',
+    'cmpid', 'ocid', 'taid', 'soc_src', 'soc_trk', 'smid', 'sr_share', 'ito', 'guccounter'
+}
+TRACKING_PREFIXES = ('utm_', 'at_', 'pk_')
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in',
+    'is', 'it', 'its', 'new', 'of', 'on', 'or', 'says', 'that', 'the', 'this', 'to',
+    'was', 'will', 'with'
+}
+
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+SIGNATURE_BITS = 64
+
+def normalize_url(url):
+    """Normalize an article URL so tracking-param and host variants compare equal."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)]
+    path = parts.path.rstrip('/') or '/'
+    scheme = 'https' if parts.scheme in ('http', 'https') else parts.scheme
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ''))
+
+def article_text(article):
+    """Return the title (without the ' - Source' suffix) and description of an article."""
+    title = article.get('title') or ''
+    source = (article.get('source') or {}).get('name')
+    if source and title.endswith(f" - {source}"):
+        title = title[:-len(source) - 3]
+    return title, article.get('description') or ''
+
+def _features(text):
+    words = [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def simhash(article):
+    """Compute a 64-bit SimHash of an article's title and description.
+
+    Title features are counted twice because descriptions vary much more
+    between outlets than headlines do.
+    """
+    title, description = article_text(article)
+    weights = [0] * SIGNATURE_BITS
+    for feature in _features(title) * 2 + _features(description):
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+        for i in range(SIGNATURE_BITS):
+            weights[i] += 1 if h >> i & 1 else -1
+
+    signature = 0
+    for i, weight in enumerate(weights):
+        if weight > 0:
+            signature |= 1 << i
+    return signature
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+class SimHashIndex:
+    """Banded SimHash index for finding signatures within `max_distance` bits.
+
+    Signatures are split into max_distance + 1 bands; by the pigeonhole
+    principle two signatures within max_distance bits share at least one
+    band exactly, so only bucket-mates need a full Hamming comparison.
+    """
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = SIGNATURE_BITS // bands
+        self.bands = []
+        for i in range(bands):
+            start = i * width
+            end = SIGNATURE_BITS if i == bands - 1 else start + width
+            self.bands.append((start, (1 << (end - start)) - 1))
+        self.buckets = defaultdict(list)
+
+    def _keys(self, signature):
+        for i, (shift, mask) in enumerate(self.bands):
+            yield i, (signature >> shift) & mask
+
+    def add(self, signature, item):
+        for key in self._keys(signature):
+            self.buckets[key].append((signature, item))
+
+    def find(self, signature):
+        """Return (found, item) for the first indexed signature close enough."""
+        for key in self._keys(signature):
+            for other, item in self.buckets.get(key, ()):
+                if hamming_distance(signature, other) <= self.max_distance:
+                    return True, item
+        return False, None
+
+def _to_signed(signature):
+    return signature - (1 << 64) if signature >= 1 << 63 else signature
+
+def _to_unsigned(signature):
+    return signature + (1 << 64) if signature < 0 else signature
+
+# Scope of signatures stored before stores were split per blog
+DEFAULT_SCOPE = 'default'
+
+class SignatureStore:
+    """Persisted signatures of published stories, used to catch duplicates across cycles.
+
+    Each blog keeps its own signatures under its `scope`, so a story one
+    blog published is still new to the others.
+    """
+
+    def __init__(self, path, scope=DEFAULT_SCOPE):
+        self.scope = scope
+        self.lock = threading.Lock()
+        self.conn = db.connect(path)
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                columns = [row[1] for row in self.conn.execute('PRAGMA table_info(story_signatures)')]
+                if columns and 'scope' not in columns:
+                    self.conn.execute('ALTER TABLE story_signatures RENAME TO story_signatures_unscoped')
+                    self.conn.execute('DROP INDEX IF EXISTS story_signatures_added')
+                self.conn.execute("""
+                    CREATE TABLE IF NOT EXISTS story_signatures (
+                        scope TEXT NOT NULL,
+                        url_key TEXT NOT NULL,
+                        signature INTEGER NOT NULL,
+                        added_at REAL NOT NULL,
+                        PRIMARY KEY (scope, url_key)
+                    )
+                """)
+                self.conn.execute(
+                    'CREATE INDEX IF NOT EXISTS story_signatures_added ON story_signatures (scope, added_at)'
+                )
+                if columns and 'scope' not in columns:
+                    self.conn.execute(
+                        'INSERT INTO story_signatures SELECT ?, url_key, signature, added_at '
+                        'FROM story_signatures_unscoped', (DEFAULT_SCOPE,)
+                    )
+                    self.conn.execute('DROP TABLE story_signatures_unscoped')
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def load(self):
+        """Return all stored (url_key, signature) pairs."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT url_key, signature FROM story_signatures WHERE scope = ?', (self.scope,)
+            ).fetchall()
+        return [(url_key, _to_unsigned(signature)) for url_key, signature in rows]
+
+    def add(self, url_key, signature):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO story_signatures (scope, url_key, signature, added_at) VALUES (?, ?, ?, ?)',
+                (self.scope, url_key, _to_signed(signature), time.time())
+            )
+
+    def prune(self, keep):
+        """Evict the oldest signatures so that at most `keep` remain."""
+        with self.lock:
+            self.conn.execute("""
+                DELETE FROM story_signatures WHERE scope = ? AND url_key NOT IN (
+                    SELECT url_key FROM story_signatures WHERE scope = ? ORDER BY added_at DESC LIMIT ?
+                )
+            """, (self.scope, self.scope, keep))
+
+def _richness(article):
+    return (bool(article.get('urlToImage')),
+            len(article.get('description') or '') + len(article.get('content') or ''))
+
+def cluster_articles(articles, known=(), max_distance=3):
+    """Cluster near-duplicate articles and return one representative per new story.
+
+    `known` holds (url_key, signature) pairs of stories published in earlier
+    cycles; clusters matching one of them are dropped entirely. Each
+    representative is the richest article of its cluster and is annotated
+    with 'url_key', 'simhash' and 'cluster_size', plus the normalized URLs
+    ('cluster_urls') and source feeds ('feeds') of all cluster members.
+    """
+    index = SimHashIndex(max_distance)
+    known_urls = set()
+    for url_key, signature in known:
+        index.add(signature, None)
+        known_urls.add(url_key)
+
+    clusters = []
+    clusters_by_url = {}
+    for article in articles:
+        url_key = normalize_url(article['url'])
+        if url_key in known_urls:
+            continue
+        if url_key in clusters_by_url:
+            cluster, signature = clusters_by_url[url_key]
+        else:
+            signature = simhash(article)
+            found, cluster = index.find(signature)
+            if found and cluster is None:
+                continue
+            if not found:
+                cluster = []
+                clusters.append(cluster)
+                index.add(signature, cluster)
+            clusters_by_url[url_key] = (cluster, signature)
+
+        article['url_key'] = url_key
+        article['simhash'] = signature
+        cluster.append(article)
+
+    representatives = []
+    for cluster in clusters:
+        best = max(cluster, key=_richness)
+        best['cluster_size'] = len(cluster)
+        best['cluster_urls'] = sorted({article['url_key'] for article in cluster})
+        best['feeds'] = sorted({article['feed'] for article in cluster if article.get('feed')})
+        representatives.append(best)
+    return representatives
+
+def drop_known(stories, known, max_distance=3):
+    """Return the clustered `stories` that match none of the `known` (url_key, signature) pairs."""
+    index = SimHashIndex(max_distance)
+    known_urls = set()
+    for url_key, signature in known:
+        index.add(signature, None)
+        known_urls.add(url_key)
+    return [story for story in stories
+            if known_urls.isdisjoint(story.get('cluster_urls') or [story['url_key']])
+            and not index.find(story['simhash'])[0]]
@@ -1,35 +1,42 @@
-import requests
+import atexit
 import json
 import os
 import time
 import hashlib
 import random
-import schedule
 import logging
-from datetime import datetime
-from bs4 import BeautifulSoup
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-import openai
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from datetime import datetime, timedelta
 from urllib.parse import urlparse
-import pickle
 from dotenv import load_dotenv
+from http_client import TokenBucket, create_session
+from http_cache import HTTPCache
+from processed_store import ProcessedStore
+from near_dedup import SignatureStore, cluster_articles, drop_known
+from ranking import KEYWORDS, score_stories
+from feed_state import FeedState, format_timestamp, parse_published
+from pipeline import Pipeline, Stage
+from blogger_publisher import BloggerPublisher
+from page_store import PageStore
+from image_resolver import ImageResolver, rank_image_candidates
+from rewrite_cache import RewriteCache
+from token_budget import context_window, count_prompt_tokens, trim_to_tokens
+from job_queue import JobQueue, STATES, state_index
+from scheduler import AdaptiveInterval, PublishPacer, QuotaTracker
+from targets import DEFAULT_TARGET, Target, load_targets, shard_targets
+import metrics
+from log_setup import setup_logging
+from heartbeat import write_heartbeat
 
-# Load environment variables
+# Load environment variables. Importing this module has no other side
+# effects: logging is configured by the entry points, and the OpenAI,
+# Google and parsing libraries, HTTP sessions and caches are loaded on
+# first use, so tools that only need the settings start quickly
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("news_bot.log"),
-        logging.StreamHandler()
-    ]
-)
-
 # API Keys and Configuration from environment variables
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
@@ -37,116 +44,507 @@ BLOGGER_CLIENT_ID = os.getenv("BLOGGER_CLIENT_ID")
 BLOGGER_CLIENT_SECRET = os.getenv("BLOGGER_CLIENT_SECRET")
 BLOG_ID = os.getenv("BLOG_ID")
 
-# Set up OpenAI
-openai.api_key = OPENAI_API_KEY
+# OpenAI endpoint; override it to run against a local stand-in
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
 
-# File to store processed articles
+# Database storing processed articles (and the legacy pickle it replaces)
+STATE_DB_FILE = "news_bot.db"
 PROCESSED_ARTICLES_FILE = "processed_articles.pkl"
 CREDENTIALS_FILE = "blogger_credentials.json"
 TOKEN_FILE = "token.pickle"
+CACHE_DB_FILE = "cache.db"
 
 # Scopes for Google API
 SCOPES = ['https://www.googleapis.com/auth/blogger']
 
+# Number of most recent processed article hashes to keep
+MAX_PROCESSED_ARTICLES = int(os.getenv("MAX_PROCESSED_ARTICLES", "1000"))
+
+# Maximum SimHash distance (in bits) between two stories considered duplicates
+NEAR_DUP_DISTANCE = int(os.getenv("NEAR_DUP_DISTANCE", "3"))
+
+# Pipeline tuning: worker threads per stage, size of the queue in front of
+# each stage, posts per cycle and seconds between two posts
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "4"))
+REWRITE_WORKERS = int(os.getenv("REWRITE_WORKERS", "2"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "4"))
+STAGE_QUEUE_SIZE = int(os.getenv("STAGE_QUEUE_SIZE", "4"))
+MAX_POSTS_PER_CYCLE = int(os.getenv("MAX_POSTS_PER_CYCLE", "3"))
+PUBLISH_INTERVAL = int(os.getenv("PUBLISH_INTERVAL", "30"))
+
+# Adaptive scheduling: feeds are polled every POLL_MIN_INTERVAL to
+# POLL_MAX_INTERVAL seconds, aiming for POLL_TARGET_NEW new articles per
+# poll without exceeding the NewsAPI daily request quota. New articles are
+# prepared right away, up to READY_BACKLOG ready posts, and posts are spread
+# evenly over POSTS_PER_DAY; ready posts older than READY_MAX_AGE_HOURS are dropped
+POLL_MIN_INTERVAL = int(os.getenv("POLL_MIN_INTERVAL", "300"))
+POLL_MAX_INTERVAL = int(os.getenv("POLL_MAX_INTERVAL", "3600"))
+POLL_TARGET_NEW = int(os.getenv("POLL_TARGET_NEW", "3"))
+NEWS_API_DAILY_QUOTA = int(os.getenv("NEWS_API_DAILY_QUOTA", "100"))
+POSTS_PER_DAY = int(os.getenv("POSTS_PER_DAY", "18"))
+READY_BACKLOG = int(os.getenv("READY_BACKLOG", "2"))
+READY_MAX_AGE_HOURS = int(os.getenv("READY_MAX_AGE_HOURS", "6"))
+
+# Durable job queue: worker identity (keep it stable across restarts so a
+# restarted worker resumes its own jobs at once), lease length, retry delay
+# and attempts per article, and days finished jobs are kept
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "900"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
 # Countries to fetch news from
 COUNTRIES = ['us', 'gb', 'au', 'ca', 'in', 'sg', 'jp']
 
-def get_blogger_service():
-    """Set up and return the Blogger API service."""
-    creds = None
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, 'rb') as token:
-            creds = pickle.load(token)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                CREDENTIALS_FILE, SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open(TOKEN_FILE, 'wb') as token:
-            pickle.dump(creds, token)
+# NewsAPI categories to fetch for each country
+CATEGORIES = ['science', 'technology']
+
+# Optional comma-separated searches run on the NewsAPI `everything` endpoint
+NEWS_QUERIES = [query.strip() for query in os.getenv("NEWS_QUERIES", "").split(",") if query.strip()]
+
+# Ranking before the rewrite: stories are scored by TF-IDF similarity to
+# RANK_KEYWORDS (comma-separated), recency (halving every
+# RANK_HALF_LIFE_HOURS), the number of outlets reporting them and
+# SOURCE_WEIGHTS ("Source Name:1.5,Other Source:0.5"); only the RANK_TOP_K
+# best new stories per target and poll are queued, best first (0 queues all)
+RANK_KEYWORDS = [word.strip() for word in os.getenv("RANK_KEYWORDS", "").split(",") if word.strip()] or KEYWORDS
+RANK_HALF_LIFE_HOURS = float(os.getenv("RANK_HALF_LIFE_HOURS", "6"))
+RANK_TOP_K = int(os.getenv("RANK_TOP_K", "10"))
+SOURCE_WEIGHTS = {
+    name.strip(): float(weight)
+    for name, _, weight in (entry.rpartition(':') for entry in os.getenv("SOURCE_WEIGHTS", "").split(","))
+    if name.strip()
+}
+
+# Labels and author name of every post
+POST_LABELS = ['Science', 'Technology', 'News', 'Innovation']
+POST_AUTHOR = 'Science & Tech News'
+
+# Blog targets: TARGETS_FILE lists the blogs to serve, each with its own
+# countries, categories, searches, post budget, labels and author; without
+# it the bot serves BLOG_ID with the settings above. SHARD_COUNT worker
+# processes split the targets by consistent hashing and SHARD_INDEX
+# (0 to SHARD_COUNT - 1) selects this process's share
+TARGETS_FILE = os.getenv("TARGETS_FILE", "targets.json")
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+
+# With several shards each one adds its index to the names of its log,
+# metrics and heartbeat files and SHARD_INDEX to the metrics port, so
+# shards on one host neither overwrite nor rotate each other's files
+SHARD_SUFFIX = f"-{SHARD_INDEX}" if SHARD_COUNT > 1 else ""
+
+# Log file; rotation is size-based, or time-based if LOG_ROTATE_WHEN is
+# set (e.g. "midnight"), with LOG_FORMAT=json for JSON-lines logs
+LOG_FILE = f"news_bot{SHARD_SUFFIX}.log"
+
+# Local metrics endpoint port (0 disables it) and JSON snapshot file
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+if METRICS_PORT and SHARD_COUNT > 1:
+    METRICS_PORT += SHARD_INDEX
+METRICS_FILE = f"metrics{SHARD_SUFFIX}.json"
+
+# Small status file rewritten by the bot every minute for check_status.py
+HEARTBEAT_FILE = f"heartbeat{SHARD_SUFFIX}.json"
+
+# API endpoints; override them to run against local stand-ins (see benchmarks/)
+NEWS_API_BASE = os.getenv("NEWS_API_BASE", "https://newsapi.org/v2")
+BLOGGER_API_ENDPOINT = os.getenv("BLOGGER_API_ENDPOINT")
+
+# Incremental fetching: articles per request, pages per feed and poll (a
+# feed is paged only until articles older than its watermark show up) and
+# hours an `everything` query looks back on its first poll
+NEWS_PAGE_SIZE = int(os.getenv("NEWS_PAGE_SIZE", "100"))
+NEWS_MAX_PAGES = int(os.getenv("NEWS_MAX_PAGES", "3"))
+NEWS_LOOKBACK_HOURS = int(os.getenv("NEWS_LOOKBACK_HOURS", "24"))
+
+# Fetch tuning: parallel feed requests, NewsAPI quota (requests per second
+# and burst size) and (connect, read) timeouts in seconds
+NEWS_FETCH_WORKERS = int(os.getenv("NEWS_FETCH_WORKERS", "4"))
+NEWS_API_RATE = float(os.getenv("NEWS_API_RATE", "2"))
+NEWS_API_BURST = int(os.getenv("NEWS_API_BURST", "4"))
+HTTP_TIMEOUT = (5, 15)
+
+# HTTP cache tuning: freshness of NewsAPI feeds and article pages in
+# seconds, and the maximum on-disk size of the cache in megabytes
+NEWS_CACHE_TTL = int(os.getenv("NEWS_CACHE_TTL", "900"))
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "86400"))
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "100"))
+
+# Most of an article page that is downloaded and parsed, in kilobytes;
+# reading usually stops much earlier, once the leading paragraphs and
+# image candidates were found
+PAGE_MAX_KB = int(os.getenv("PAGE_MAX_KB", "1024"))
+
+# NewsAPI rate limiter and daily quota
+news_api_limiter = TokenBucket(NEWS_API_RATE, NEWS_API_BURST)
+news_quota = QuotaTracker(NEWS_API_DAILY_QUOTA)
+
+# Number of image candidates probed in parallel per article
+IMAGE_PROBE_COUNT = int(os.getenv("IMAGE_PROBE_COUNT", "4"))
+
+# Model used for the rewrite. Bump PROMPT_VERSION whenever the prompt
+# changes so cached rewrites are not reused.
+REWRITE_MODEL = "gpt-4"
+PROMPT_VERSION = 2
+
+# Token budget of a rewrite: source text sent to the model and the
+# completion (article, title and meta description) it may produce
+REWRITE_SOURCE_TOKENS = int(os.getenv("REWRITE_SOURCE_TOKENS", "1500"))
+REWRITE_COMPLETION_TOKENS = int(os.getenv("REWRITE_COMPLETION_TOKENS", "1800"))
+
+# Rewrite cache limits: number of entries and maximum age in days
+REWRITE_CACHE_MAX_ENTRIES = int(os.getenv("REWRITE_CACHE_MAX_ENTRIES", "500"))
+REWRITE_CACHE_MAX_AGE_DAYS = int(os.getenv("REWRITE_CACHE_MAX_AGE_DAYS", "30"))
+
+# OpenAI dispatcher tuning: requests in flight and per-minute request and
+# token limits (adjusted at runtime from the API's rate-limit headers)
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "4"))
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "10000"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+
+# Instrumentation exposed on the metrics endpoint and in METRICS_FILE
+registry = metrics.Registry()
+CALL_DURATION = registry.histogram('newsbot_call_duration_seconds', 'Wall time of bot functions')
+ARTICLES = registry.counter('newsbot_articles_total', 'Articles per pipeline outcome')
+FAILURES = registry.counter('newsbot_failures_total', 'Failures per stage and reason')
+OPENAI_TOKENS = registry.counter('newsbot_openai_tokens_total', 'OpenAI tokens used by rewrites')
+CACHE_LOOKUPS = registry.gauge('newsbot_cache_lookups', 'Cache lookups per cache and result')
+CACHE_HIT_RATIO = registry.gauge('newsbot_cache_hit_ratio', 'Share of cache lookups answered from the cache')
+POLL_INTERVAL = registry.gauge('newsbot_poll_interval_seconds', 'Seconds until the next feed poll')
+PUBLISH_LAG = registry.histogram('newsbot_publish_lag_seconds', 'Time from source publication to our post',
+                                 buckets=(60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400))
+
+def configure_logging():
+    """Send the bot's log to LOG_FILE and the console; called by the entry points."""
+    setup_logging(
+        LOG_FILE,
+        max_bytes=int(os.getenv("LOG_MAX_MB", "10")) * 1024 * 1024,
+        backup_count=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+        when=os.getenv("LOG_ROTATE_WHEN") or None,
+        json_format=os.getenv("LOG_FORMAT", "text") == "json"
+    )
+
+_resources = {}
+_resources_lock = threading.Lock()
+
+def _shared(name, factory):
+    """Return the shared resource `name`, creating it with `factory` on first use."""
+    with _resources_lock:
+        if name not in _resources:
+            _resources[name] = factory()
+        return _resources[name]
+
+def get_http_session():
+    """Return the shared keep-alive HTTP session."""
+    return _shared('http_session', lambda: create_session(pool_size=NEWS_FETCH_WORKERS))
+
+def get_http_cache():
+    """Return the shared HTTP response cache."""
+    return _shared('http_cache', lambda: HTTPCache(CACHE_DB_FILE, max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024))
+
+def get_image_resolver():
+    """Return the shared image resolver."""
+    return _shared('image_resolver', lambda: ImageResolver(CACHE_DB_FILE, probe_count=IMAGE_PROBE_COUNT))
+
+def get_rewrite_cache():
+    """Return the shared AI rewrite cache."""
+    return _shared('rewrite_cache', lambda: RewriteCache(CACHE_DB_FILE, max_entries=REWRITE_CACHE_MAX_ENTRIES,
+                                                         max_age=REWRITE_CACHE_MAX_AGE_DAYS * 86400))
+
+def collect_cache_metrics():
+    """Copy the cache counters into the cache gauges."""
+    http_stats = get_http_cache().stats()
+    for result in ('hits', 'revalidated', 'misses'):
+        CACHE_LOOKUPS.set(http_stats[result], cache='http', result=result)
+    CACHE_HIT_RATIO.set(http_stats['hit_rate'], cache='http')
     
-    return build('blogger', 'v3', credentials=creds)
+    rewrite_stats = get_rewrite_cache().stats()
+    for result in ('hits', 'misses'):
+        CACHE_LOOKUPS.set(rewrite_stats[result], cache='rewrite', result=result)
+    CACHE_HIT_RATIO.set(rewrite_stats['hit_rate'], cache='rewrite')
+
+registry.add_collector(collect_cache_metrics)
+
+_publishers = {}
+_publisher_lock = threading.Lock()
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_openai_dispatcher():
+    """Return the shared OpenAI dispatcher, starting it on first use."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            import openai
+            from openai_dispatcher import OpenAIDispatcher
+            
+            openai.api_key = OPENAI_API_KEY
+            if OPENAI_API_BASE:
+                openai.api_base = OPENAI_API_BASE
+            _dispatcher = OpenAIDispatcher(
+                concurrency=OPENAI_CONCURRENCY,
+                requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+                tokens_per_minute=OPENAI_TOKENS_PER_MINUTE,
+                max_retries=OPENAI_MAX_RETRIES
+            )
+            atexit.register(close_openai_dispatcher)
+        return _dispatcher
+
+def close_openai_dispatcher():
+    """Close the shared OpenAI dispatcher, if it was started; runs at exit."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            _dispatcher.close()
+            _dispatcher = None
+
+def get_blogger_publisher(blog_id=None):
+    """Return the Blogger publisher of `blog_id` (BLOG_ID by default), creating it on first use."""
+    blog_id = blog_id or BLOG_ID
+    with _publisher_lock:
+        if blog_id not in _publishers:
+            _publishers[blog_id] = BloggerPublisher(blog_id, TOKEN_FILE, CREDENTIALS_FILE, SCOPES,
+                                                    api_endpoint=BLOGGER_API_ENDPOINT)
+        return _publishers[blog_id]
 
 def load_processed_articles():
-    """Load the list of already processed articles."""
-    if os.path.exists(PROCESSED_ARTICLES_FILE):
-        with open(PROCESSED_ARTICLES_FILE, 'rb') as f:
-            return pickle.load(f)
-    return set()
-
-def save_processed_articles(processed_articles):
-    """Save the updated list of processed articles."""
-    with open(PROCESSED_ARTICLES_FILE, 'wb') as f:
-        pickle.dump(processed_articles, f)
-
-def fetch_science_tech_news():
-    """Fetch science and technology news from various countries."""
-    all_articles = []
+    """Open the store of already processed articles."""
+    return ProcessedStore(STATE_DB_FILE, legacy_file=PROCESSED_ARTICLES_FILE)
+
+def load_all_targets():
+    """Return every configured blog target, or the single BLOG_ID target without a TARGETS_FILE."""
+    defaults = {
+        'blog_id': BLOG_ID,
+        'countries': COUNTRIES,
+        'categories': CATEGORIES,
+        'queries': NEWS_QUERIES,
+        'posts_per_day': POSTS_PER_DAY,
+        'labels': POST_LABELS,
+        'author': POST_AUTHOR
+    }
+    if os.path.exists(TARGETS_FILE):
+        return load_targets(TARGETS_FILE, defaults)
+    return [Target(DEFAULT_TARGET, **defaults)]
+
+def load_local_targets():
+    """Return the blog targets served by this shard."""
+    return shard_targets(load_all_targets(), SHARD_INDEX, SHARD_COUNT)
+
+def target_feeds(target):
+    """Return the feeds `target` draws from as (name, endpoint, params) tuples."""
+    feeds = [(f"top-headlines/{country}/{category}", 'top-headlines', {'country': country, 'category': category})
+             for country in target.countries for category in target.categories]
+    feeds += [(f"everything/{query}", 'everything', {'q': query, 'language': 'en', 'sortBy': 'publishedAt'})
+              for query in target.queries]
+    return feeds
+
+def news_feeds(targets):
+    """Return every feed to poll for `targets`, each feed listed once."""
+    feeds = {}
+    for target in targets:
+        for feed in target_feeds(target):
+            feeds.setdefault(feed[0], feed)
+    return list(feeds.values())
+
+def watermark_key(feed):
+    """Return the feed_state key of `feed`; each shard keeps its own watermarks."""
+    return feed if SHARD_COUNT <= 1 else f"{feed}@{SHARD_INDEX}/{SHARD_COUNT}"
+
+def fetch_page(endpoint, params, ttl=NEWS_CACHE_TTL):
+    """Request one page from a NewsAPI endpoint and return the decoded response."""
+    response = get_http_cache().get(
+        get_http_session(),
+        f"{NEWS_API_BASE}/{endpoint}",
+        params={**params, 'apiKey': NEWS_API_KEY},
+        ttl=ttl,
+        limiter=news_api_limiter,
+        timeout=HTTP_TIMEOUT
+    )
+    # Revalidations and urllib3 retries count against the quota too
+    if response.network_requests:
+        news_quota.record(response.network_requests)
+        news_quota.update(response.headers)
+    data = response.json()
     
-    for country in COUNTRIES:
-        try:
-            # Science news
-            science_url = f"https://newsapi.org/v2/top-headlines?country={country}&category=science&apiKey={NEWS_API_KEY}"
-            science_response = requests.get(science_url)
-            science_data = science_response.json()
-            
-            # Technology news
-            tech_url = f"https://newsapi.org/v2/top-headlines?country={country}&category=technology&apiKey={NEWS_API_KEY}"
-            tech_response = requests.get(tech_url)
-            tech_data = tech_response.json()
-            
-            if science_data.get('status') == 'ok':
-                all_articles.extend(science_data.get('articles', []))
-            
-            if tech_data.get('status') == 'ok':
-                all_articles.extend(tech_data.get('articles', []))
-                
-            # Avoid rate limiting
-            time.sleep(1)
-            
-        except Exception as e:
-            logging.error(f"Error fetching news from {country}: {str(e)}")
+    if data.get('code') == 'rateLimited':
+        news_quota.exhausted()
+    return data
+
+def fetch_feed(name, endpoint, params, watermark=None, ttl=NEWS_CACHE_TTL):
+    """Fetch the articles of one feed published at or after its `watermark`.
+    
+    Pages are requested newest first until one contains older articles,
+    so a poll costs one request unless the feed grew by more than a page.
+    A feed without a watermark is read from its first page only.
+    """
+    params = dict(params, pageSize=NEWS_PAGE_SIZE)
+    if endpoint == 'everything':
+        params['from'] = watermark or format_timestamp(datetime.utcnow() - timedelta(hours=NEWS_LOOKBACK_HOURS))
+    since = parse_published(watermark)
+    
+    articles = []
+    for page in range(1, NEWS_MAX_PAGES + 1):
+        data = fetch_page(endpoint, dict(params, page=page), ttl)
+        if data.get('status') != 'ok':
+            FAILURES.inc(stage='fetch', reason=data.get('code', 'api_error'))
+            logging.warning(f"NewsAPI returned an error for {name}: {data.get('message', 'Unknown error')}")
+            break
+        
+        batch = data.get('articles', [])
+        new = [article for article in batch
+               if since is None or (parse_published(article.get('publishedAt')) or since) >= since]
+        for article in new:
+            article['feed'] = name
+        articles.extend(new)
+        
+        if since is None or len(new) < len(batch) or page * NEWS_PAGE_SIZE >= data.get('totalResults', 0):
+            break
+    
+    return articles
+
+@CALL_DURATION.time(function='fetch_science_tech_news')
+def fetch_science_tech_news(ttl=NEWS_CACHE_TTL, feed_state=None, targets=None):
+    """Fetch the news of every feed of `targets` (this shard's targets by default).
+    
+    Feeds shared by several targets are fetched once. With a
+    `feed_state`, only articles at or after each feed's watermark are
+    returned.
+    """
+    feeds = news_feeds(targets or load_local_targets())
+    watermarks = feed_state.watermarks() if feed_state else {}
+    results = {}
+    
+    # Fetch all feeds concurrently; the token bucket keeps us inside the quota
+    # and fresh cached feeds cost no request at all
+    with ThreadPoolExecutor(max_workers=NEWS_FETCH_WORKERS) as executor:
+        futures = {executor.submit(fetch_feed, name, endpoint, params, watermarks.get(watermark_key(name)), ttl): name
+                   for name, endpoint, params in feeds}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                FAILURES.inc(stage='fetch', reason=type(e).__name__)
+                logging.error(f"Error fetching {name}: {str(e)}")
+    
+    # Keep the original feed ordering
+    all_articles = []
+    for name, _, _ in feeds:
+        all_articles.extend(results.get(name, []))
     
     return all_articles
 
-def get_article_hash(article):
-    """Generate a unique hash for an article based on title and URL."""
+def advance_watermarks(feed_state, articles):
+    """Move each feed's watermark to the newest article fetched from it."""
+    newest = {}
+    for article in articles:
+        published = parse_published(article.get('publishedAt'))
+        if published and (article['feed'] not in newest or published > newest[article['feed']]):
+            newest[article['feed']] = published
+    for feed, published in newest.items():
+        feed_state.advance(watermark_key(feed), published)
+
+def dedupe_articles(articles):
+    """Collapse near-duplicate stories into one representative each.
+    
+    Articles whose normalized URL or title/description SimHash matches an
+    earlier one in this batch never reach the AI rewrite stage. The
+    clustering is done once for all targets.
+    """
+    articles = [a for a in articles if a.get('title') and a.get('url')]
+    unique = cluster_articles(articles, (), NEAR_DUP_DISTANCE)
+    logging.info(f"Kept {len(unique)} unique stories out of {len(articles)} articles")
+    return unique
+
+def rank_stories(stories):
+    """Score stories for how much they are worth a rewrite and return them best first."""
+    scores = score_stories(stories, RANK_KEYWORDS, SOURCE_WEIGHTS, RANK_HALF_LIFE_HOURS)
+    for story, score in zip(stories, scores):
+        story['score'] = round(float(score), 4)
+    return sorted(stories, key=lambda story: story['score'], reverse=True)
+
+def route_stories(stories, targets, signature_stores, job_queue=None):
+    """Return (target, story) pairs for every target that draws from a story's feeds.
+    
+    Stories a target already published in an earlier cycle, or still has
+    a job for in `job_queue`, are skipped for that target only.
+    """
+    routed = []
+    for target in targets:
+        feeds = {name for name, _, _ in target_feeds(target)}
+        candidates = [story for story in stories if feeds.intersection(story.get('feeds') or [story.get('feed')])]
+        known = signature_stores[target.name].load()
+        if job_queue is not None:
+            known += job_queue.pending_signatures(target.name)
+        routed.extend((target, story) for story in drop_known(candidates, known, NEAR_DUP_DISTANCE))
+    return routed
+
+def get_article_hash(article, target=DEFAULT_TARGET):
+    """Generate a unique hash for an article based on title and URL, scoped to a blog target."""
     unique_string = f"{article['title']}{article['url']}"
+    if target != DEFAULT_TARGET:
+        unique_string = f"{target}\n{unique_string}"
     return hashlib.md5(unique_string.encode()).hexdigest()
 
-def rewrite_with_ai(article):
-    """Rewrite the article using OpenAI to make it SEO-friendly and human-like."""
-    try:
-        # Extract content
-        title = article['title']
-        description = article.get('description', '')
-        content = article.get('content', '')
-        url = article['url']
-        
-        # Get more content from the original URL if available
-        full_content = description + " " + content
-        if len(full_content) < 200:
-            try:
-                response = requests.get(url, timeout=10)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    paragraphs = soup.find_all('p')
-                    additional_content = ' '.join([p.text for p in paragraphs[:5]])
-                    full_content += " " + additional_content
-            except Exception as e:
-                logging.warning(f"Could not fetch additional content: {str(e)}")
-        
-        # Create prompt for OpenAI
-        prompt = f"""
+def new_page_store(max_pages=None):
+    """Create a page store that fetches and parses each article page once."""
+    return PageStore(get_http_session(), get_http_cache(), PAGE_CACHE_TTL, HTTP_TIMEOUT, max_pages,
+                     max_bytes=PAGE_MAX_KB * 1024)
+
+@CALL_DURATION.time(function='extract_article_content')
+def extract_article_content(article, page_store=None):
+    """Collect the source text for the rewrite, scraping the page if the feed text is short."""
+    description = article.get('description') or ''
+    content = article.get('content') or ''
+    
+    # Get more content from the original URL if available
+    full_content = description + " " + content
+    if len(full_content) < 200:
+        page = (page_store or new_page_store()).get(article['url'])
+        if page.paragraphs:
+            full_content += " " + ' '.join(page.paragraphs)
+    
+    article['full_content'] = full_content
+    return article
+
+REWRITE_SYSTEM_PROMPT = "You are an expert science and technology writer who creates engaging, SEO-optimized content."
+
+# Structured output of a rewrite: title, HTML body and meta description in one call
+REWRITE_FUNCTION = {
+    "name": "publish_article",
+    "description": "Publish the rewritten article.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "title": {
+                "type": "string",
+                "description": "Engaging title, different from the original but capturing the essence"
+            },
+            "html": {
+                "type": "string",
+                "description": "The full article in HTML ready for publishing, starting with the title as H1"
+            },
+            "meta_description": {
+                "type": "string",
+                "description": "Compelling SEO meta description under 160 characters"
+            }
+        },
+        "required": ["title", "html", "meta_description"]
+    }
+}
+
+def build_rewrite_prompt(title, content, url):
+    """Create the rewrite prompt for OpenAI."""
+    return f"""
         Rewrite the following science/technology news article in a human-like, engaging style.
         Make it SEO-friendly with appropriate headings, subheadings, and keywords.
         Include an introduction, main content with 3-5 paragraphs, and a conclusion.
         
         Original Title: {title}
-        Original Content: {full_content}
+        Original Content: {content}
         Source URL: {url}
         
         Format the article with:
@@ -156,197 +554,570 @@ def rewrite_with_ai(article):
         4. Bullet points where appropriate
         5. A conclusion paragraph
         6. Include relevant keywords naturally throughout the text
-        7. Add meta description for SEO
         
-        Return the article in HTML format ready for publishing.
+        Return the title, the article in HTML format ready for publishing and a meta
+        description for SEO by calling publish_article.
         """
+
+def build_rewrite_request(title, full_content, url):
+    """Build the chat completion request for a rewrite within the model's token budget.
+    
+    The source text is trimmed so that the prompt plus the completion
+    budget fit in the context window, and max_tokens is set to whatever
+    budget remains.
+    """
+    def messages_for(content):
+        return [
+            {"role": "system", "content": REWRITE_SYSTEM_PROMPT},
+            {"role": "user", "content": build_rewrite_prompt(title, content, url)}
+        ]
+    
+    window = context_window(REWRITE_MODEL)
+    overhead = count_prompt_tokens(messages_for(""), REWRITE_MODEL, [REWRITE_FUNCTION])
+    source_budget = min(REWRITE_SOURCE_TOKENS, window - REWRITE_COMPLETION_TOKENS - overhead)
+    messages = messages_for(trim_to_tokens(full_content, source_budget, REWRITE_MODEL))
+    prompt_tokens = count_prompt_tokens(messages, REWRITE_MODEL, [REWRITE_FUNCTION])
+    
+    return {
+        'model': REWRITE_MODEL,
+        'messages': messages,
+        'functions': [REWRITE_FUNCTION],
+        'function_call': {"name": REWRITE_FUNCTION['name']},
+        'max_tokens': min(REWRITE_COMPLETION_TOKENS, window - prompt_tokens),
+        'temperature': 0.7
+    }
+
+def parse_rewrite_response(response, title):
+    """Extract (title, html, meta description) from a rewrite completion."""
+    message = response.choices[0].message
+    function_call = message.get('function_call')
+    if function_call:
+        fields = json.loads(function_call['arguments'], strict=False)
+        return (fields.get('title') or title).strip(), fields['html'].strip(), fields.get('meta_description', '').strip()
+    
+    # The model answered in plain text; take the title from the H1
+    rewritten_content = (message.get('content') or '').strip()
+    from bs4 import BeautifulSoup
+    
+    h1_tag = BeautifulSoup(rewritten_content, 'html.parser').find('h1')
+    return (h1_tag.text if h1_tag else title), rewritten_content, ''
+
+@CALL_DURATION.time(function='rewrite_with_ai')
+def rewrite_with_ai(article):
+    """Rewrite the article using OpenAI to make it SEO-friendly and human-like.
+    
+    Title, HTML body and meta description come back from a single
+    structured call. Token usage and latency are recorded in the result.
+    """
+    try:
+        # Extract content
+        title = article['title']
+        url = article['url']
         
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert science and technology writer who creates engaging, SEO-optimized content."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1500,
-            temperature=0.7
-        )
-        
-        rewritten_content = response.choices[0].message['content'].strip()
-        
-        # Extract a new title from the rewritten content
-        soup = BeautifulSoup(rewritten_content, 'html.parser')
-        h1_tag = soup.find('h1')
-        new_title = h1_tag.text if h1_tag else title
+        full_content = article.get('full_content')
+        if full_content is None:
+            full_content = extract_article_content(article)['full_content']
         
-        # Generate meta description for SEO
-        meta_prompt = f"Generate a compelling meta description (under 160 characters) for this article about: {new_title}"
-        meta_response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an SEO expert."},
-                {"role": "user", "content": meta_prompt}
-            ],
-            max_tokens=100,
-            temperature=0.7
+        # Reuse an earlier rewrite of the same source content, e.g. after a failed post
+        cache_key = RewriteCache.make_key(
+            [title, full_content, article.get('url_key') or url], PROMPT_VERSION, REWRITE_MODEL
         )
+        cached = get_rewrite_cache().get(cache_key)
+        if cached:
+            logging.info(f"Using cached rewrite for: {title}")
+            return dict(cached, original_url=url, cached=True)
+        
+        started = time.monotonic()
+        response = get_openai_dispatcher().create(**build_rewrite_request(title, full_content, url))
+        latency = time.monotonic() - started
         
-        meta_description = meta_response.choices[0].message['content'].strip()
+        new_title, rewritten_content, meta_description = parse_rewrite_response(response, title)
+        usage = response.get('usage', {})
         
-        return {
+        result = {
             'title': new_title,
             'content': rewritten_content,
             'original_url': url,
-            'meta_description': meta_description
+            'meta_description': meta_description,
+            'usage': {
+                'prompt_tokens': usage.get('prompt_tokens', 0),
+                'completion_tokens': usage.get('completion_tokens', 0),
+                'latency': round(latency, 3)
+            }
         }
+        ARTICLES.inc(outcome='rewritten')
+        OPENAI_TOKENS.inc(result['usage']['prompt_tokens'], kind='prompt')
+        OPENAI_TOKENS.inc(result['usage']['completion_tokens'], kind='completion')
+        logging.info(f"Rewrote article in {latency:.1f}s using {result['usage']['prompt_tokens']} prompt + "
+                     f"{result['usage']['completion_tokens']} completion tokens: {new_title}")
+        
+        get_rewrite_cache().put(cache_key, result, REWRITE_MODEL, PROMPT_VERSION, source_url=url)
+        return result
         
     except Exception as e:
+        FAILURES.inc(stage='rewrite', reason=type(e).__name__)
         logging.error(f"Error rewriting article: {str(e)}")
         return None
 
-def get_image_from_article(article):
+@CALL_DURATION.time(function='get_image_from_article')
+def get_image_from_article(article, page_store=None):
     """Extract image from the article or find a free-to-use image."""
     try:
         # First try to get the image from the article
         if article.get('urlToImage'):
-            image_url = article['urlToImage']
-            # Check if the image URL is valid
-            response = requests.head(image_url)
-            if response.status_code == 200:
+            image_url = get_image_resolver().resolve([article['urlToImage']])
+            if image_url:
                 return image_url
         
-        # If no image or invalid image, try to extract one from the article content
-        url = article['url']
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            images = soup.find_all('img', src=True)
-            
-            for img in images:
-                if img['src'].startswith('http') and not any(x in img['src'].lower() for x in ['icon', 'logo', 'avatar']):
-                    # Check if the image is accessible
-                    try:
-                        img_response = requests.head(img['src'], timeout=5)
-                        if img_response.status_code == 200:
-                            return img['src']
-                    except:
-                        continue
+        # If no image or invalid image, try the best candidates from the article page
+        page = (page_store or new_page_store()).get(article['url'])
+        candidates = [url for url in rank_image_candidates(page) if url != article.get('urlToImage')]
+        image_url = get_image_resolver().resolve(candidates)
+        if image_url:
+            return image_url
         
         # If still no image, use a placeholder from Unsplash (free to use)
         keywords = '+'.join(article['title'].split()[:3])
         return f"https://source.unsplash.com/featured/?{keywords}"
         
     except Exception as e:
+        FAILURES.inc(stage='image', reason=type(e).__name__)
         logging.error(f"Error getting image: {str(e)}")
         # Return a generic science/tech image
         return "https://source.unsplash.com/featured/?science,technology"
 
-def post_to_blogger(article, image_url):
-    """Post the rewritten article to Blogger."""
-    try:
-        service = get_blogger_service()
-        
-        # Add image to the content with proper alt text for SEO
-        image_html = f'<div class="post-image"><img src="{image_url}" alt="{article["title"]}" title="{article["title"]}" /></div>'
-        
-        # Add source attribution
-        source_html = f'<p class="source">Source: <a href="{article["original_url"]}" target="_blank" rel="nofollow">Original Article</a></p>'
-        
-        # Prepare the post content
-        content = f"{image_html}\n{article['content']}\n{source_html}"
-        
-        # Create post body with meta description for SEO
-        post_body = {
-            'kind': 'blogger#post',
-            'title': article['title'],
-            'content': content,
-            'labels': ['Science', 'Technology', 'News', 'Innovation'],
-            'author': {
-                'displayName': 'Science & Tech News'
-            }
+def build_post_body(article, image_url, target=None):
+    """Build the Blogger post resource for a rewritten article."""
+    # Add image to the content with proper alt text for SEO
+    image_html = f'<div class="post-image"><img src="{image_url}" alt="{article["title"]}" title="{article["title"]}" /></div>'
+    
+    # Add source attribution
+    source_html = f'<p class="source">Source: <a href="{article["original_url"]}" target="_blank" rel="nofollow">Original Article</a></p>'
+    
+    # Prepare the post content, with the custom meta description for SEO
+    content = f"{image_html}\n{article['content']}\n{source_html}"
+    if article.get('meta_description'):
+        content = f'<!-- meta-description: {article["meta_description"]} -->\n{content}'
+    
+    return {
+        'kind': 'blogger#post',
+        'title': article['title'],
+        'content': content,
+        'labels': target.labels if target else POST_LABELS,
+        'author': {
+            'displayName': (target.author if target else None) or POST_AUTHOR
         }
-        
-        # Post to Blogger
-        post = service.posts().insert(blogId=BLOG_ID, body=post_body).execute()
-        
-        # Update the post with custom meta description
-        if article.get('meta_description'):
-            post['content'] = f'<!-- meta-description: {article["meta_description"]} -->\n{post["content"]}'
-            service.posts().update(blogId=BLOG_ID, postId=post['id'], body=post).execute()
-            
-        logging.info(f"Posted article: {article['title']} - Post ID: {post['id']}")
+    }
+
+@CALL_DURATION.time(function='post_to_blogger')
+def post_to_blogger(article, image_url, target=None):
+    """Post the rewritten article to the target's blog in a single insert call."""
+    try:
+        publisher = get_blogger_publisher(target.blog_id if target else None)
+        post = publisher.publish(build_post_body(article, image_url, target))
+        ARTICLES.inc(outcome='posted', target=target.name if target else DEFAULT_TARGET)
+        logging.info(f"Posted article to {publisher.blog_id}: {article['title']} - Post ID: {post['id']}")
         return True
         
     except Exception as e:
+        FAILURES.inc(stage='publish', reason=type(e).__name__)
         logging.error(f"Error posting to Blogger: {str(e)}")
         return False
 
-def process_news():
-    """Main function to process news articles."""
-    logging.info("Starting news processing cycle")
+def open_job_queue():
+    """Open the persistent per-article job queue."""
+    return JobQueue(STATE_DB_FILE, lease_seconds=JOB_LEASE_SECONDS,
+                    retry_delay=JOB_RETRY_DELAY, max_attempts=JOB_MAX_ATTEMPTS)
+
+class BotState:
+    """Persistent stores of one bot process and the blog targets it serves.
     
-    # Load already processed articles
-    processed_articles = load_processed_articles()
+    Processed articles, feed watermarks and jobs live in shared tables;
+    published story signatures are kept per target.
+    """
     
-    # Fetch news
-    articles = fetch_science_tech_news()
+    def __init__(self, targets=None):
+        all_targets = load_all_targets()
+        if targets is None:
+            targets = shard_targets(all_targets, SHARD_INDEX, SHARD_COUNT)
+        self.targets = {target.name: target for target in targets}
+        self.total_targets = len(all_targets)
+        self.processed_articles = load_processed_articles()
+        self.signature_stores = {name: SignatureStore(STATE_DB_FILE, scope=name) for name in self.targets}
+        self.feed_state = FeedState(STATE_DB_FILE)
+        self.job_queue = open_job_queue()
+        logging.info(f"Serving {len(self.targets)} of {self.total_targets} blog targets: "
+                     f"{', '.join(self.targets) or 'none'}")
+
+def enqueue_new_articles(state, ttl=NEWS_CACHE_TTL):
+    """Fetch new articles from the feeds and queue every unique one a target has not processed; returns the number queued."""
+    targets = list(state.targets.values())
+    articles = fetch_science_tech_news(ttl, state.feed_state, targets)
+    fetched = articles
     logging.info(f"Fetched {len(articles)} articles")
+    ARTICLES.inc(len(articles), outcome='fetched')
     
-    # Process each article
-    articles_posted = 0
-    for article in articles:
-        # Skip if no title or URL
-        if not article.get('title') or not article.get('url'):
-            continue
-            
-        # Generate hash to check for duplicates
-        article_hash = get_article_hash(article)
-        
-        # Skip if already processed
-        if article_hash in processed_articles:
+    # Drop articles without a title or URL and collapse near-duplicates
+    fetched_count = len(articles)
+    articles = dedupe_articles(articles)
+    ARTICLES.inc(fetched_count - len(articles), outcome='deduped')
+    
+    # Queue a job per target for the best stories the target has not
+    # processed yet, in score order so the best are prepared first. Stories
+    # ranked out are recorded as processed, so a later poll that fetches
+    # them again (the newest article of a feed is at its watermark) does
+    # not queue them after all
+    routed = route_stories(rank_stories(articles), targets, state.signature_stores, state.job_queue)
+    routed.sort(key=lambda pair: pair[1]['score'], reverse=True)
+    queued = 0
+    ranked_out = 0
+    queued_per_target = dict.fromkeys(state.targets, 0)
+    batch_time = time.time()
+    for target, article in routed:
+        article_hash = get_article_hash(article, target.name)
+        if article_hash in state.processed_articles:
             continue
-            
-        # Rewrite the article
-        rewritten = rewrite_with_ai(article)
-        if not rewritten:
+        if RANK_TOP_K and queued_per_target[target.name] >= RANK_TOP_K:
+            state.processed_articles.add(article_hash)
+            ranked_out += 1
             continue
-            
-        # Get image
-        image_url = get_image_from_article(article)
+        if state.job_queue.enqueue(article_hash, dict(article, target=target.name), batch_time, target.name):
+            queued += 1
+            queued_per_target[target.name] += 1
+    logging.info(f"Queued {queued} new articles, skipped {ranked_out} lower-ranked ones")
+    ARTICLES.inc(queued, outcome='queued')
+    ARTICLES.inc(ranked_out, outcome='ranked_out')
+    
+    # The next poll only needs articles newer than the ones just queued
+    advance_watermarks(state.feed_state, fetched)
+    return queued
+
+# Returned by a stage's work to hand the job back unchanged for a later pass
+DEFER = object()
+
+def job_stage(job_queue, state, work):
+    """Wrap `work` so it is skipped for jobs past `state` and its result is persisted."""
+    def run(job):
+        if state_index(job['state']) >= state_index(state):
+            return job
+        result = work(job['article'])
+        if result is DEFER:
+            job_queue.release(job, WORKER_ID)
+            return None
+        if not result:
+            job_queue.fail(job, f"{state} stage failed", WORKER_ID)
+            return None
+        return job if job_queue.advance(job, state, WORKER_ID) else None
+    return run
+
+def preparation_stages(job_queue, page_store):
+    """Return the extract, rewrite and image stages that turn a fetched article into a ready post."""
+    def extract(article):
+        return extract_article_content(article, page_store)
+    
+    def rewrite(article):
+        article['rewritten'] = rewrite_with_ai(article)
+        return article['rewritten'] is not None
+    
+    def find_image(article):
+        article['image_url'] = get_image_from_article(article, page_store)
+        return True
+    
+    return [
+        Stage('extract', job_stage(job_queue, 'extracted', extract), EXTRACT_WORKERS, STAGE_QUEUE_SIZE),
+        Stage('rewrite', job_stage(job_queue, 'rewritten', rewrite), REWRITE_WORKERS, STAGE_QUEUE_SIZE),
+        Stage('image', job_stage(job_queue, 'imaged', find_image), IMAGE_WORKERS, STAGE_QUEUE_SIZE)
+    ]
+
+def publish_article(article, state):
+    """Post a prepared article to its target's blog and remember it as published."""
+    target = state.targets[article.get('target', DEFAULT_TARGET)]
+    if not post_to_blogger(article['rewritten'], article['image_url'], target):
+        return False
+    record_published(article, state)
+    return True
+
+def record_published(article, state):
+    """Remember a posted article so its target does not publish the story again."""
+    target = state.targets[article.get('target', DEFAULT_TARGET)]
+    state.processed_articles.add(get_article_hash(article, target.name))
+    state.signature_stores[target.name].add(article['url_key'], article['simhash'])
+    try:
+        published = datetime.strptime(article['publishedAt'], '%Y-%m-%dT%H:%M:%SZ')
+        PUBLISH_LAG.observe(max(0, (datetime.utcnow() - published).total_seconds()))
+    except (KeyError, TypeError, ValueError):
+        pass
+
+def housekeeping(state):
+    """Log cache statistics, prune old state and write the heartbeat."""
+    logging.info(f"Job queue: {state.job_queue.counts()}")
+    
+    cache_stats = get_http_cache().stats()
+    logging.info(f"HTTP cache: {cache_stats['hits']} hits, {cache_stats['revalidated']} revalidated, "
+                 f"{cache_stats['misses']} misses ({cache_stats['entries']} entries, {cache_stats['bytes']} bytes)")
+    
+    rewrite_cache = get_rewrite_cache()
+    rewrite_cache.evict()
+    rewrite_stats = rewrite_cache.stats()
+    logging.info(f"Rewrite cache: {rewrite_stats['entries']} entries, hit rate {rewrite_stats['hit_rate']:.0%}")
+    
+    # Clean up old hashes (keep only the most recently added ones per
+    # target; the store is shared by all targets) and finished jobs
+    state.processed_articles.prune(MAX_PROCESSED_ARTICLES * max(state.total_targets, 1))
+    for signature_store in state.signature_stores.values():
+        signature_store.prune(MAX_PROCESSED_ARTICLES)
+    state.job_queue.prune(JOB_RETENTION_DAYS * 86400)
+    
+    beat(processed_articles=state.processed_articles.count(), jobs=state.job_queue.counts())
+
+@CALL_DURATION.time(function='process_news')
+def process_news():
+    """Run one complete processing cycle.
+    
+    New articles are added to the persistent job queue, then jobs flow
+    through extract -> rewrite -> image -> publish stages, each with its
+    own worker pool and bounded queue, so network waits of different
+    articles overlap. Every stage records its result in the job table,
+    so jobs left unfinished by a crash resume where they stopped, and
+    several processes can drain the same queue. Only the publish stage
+    is paced, and every target gets up to MAX_POSTS_PER_CYCLE posts.
+    """
+    logging.info("Starting news processing cycle")
+    
+    # Load already processed articles, published story signatures and jobs
+    state = BotState()
+    job_queue = state.job_queue
+    
+    # Jobs this worker held when it last stopped can be resumed right away
+    job_queue.release_all(WORKER_ID)
+    
+    enqueue_new_articles(state)
+    
+    # Every stage shares one page store, so each article page is fetched and parsed once
+    page_store = new_page_store()
+    
+    posted = {name: 0 for name in state.targets}
+    pacer = PublishPacer(PUBLISH_INTERVAL)
+    
+    def open_targets():
+        return [name for name, count in posted.items() if count < MAX_POSTS_PER_CYCLE]
+    
+    def publish(article):
+        # Leave articles of targets that reached their limit for the next cycle
+        target = article.get('target', DEFAULT_TARGET)
+        if target not in open_targets():
+            return DEFER
         
-        # Post to Blogger
-        if post_to_blogger(rewritten, image_url):
-            processed_articles.add(article_hash)
-            articles_posted += 1
-            
-            # Save after each successful post
-            save_processed_articles(processed_articles)
-            
-            # Limit to 3 posts per cycle to avoid API rate limits
-            if articles_posted >= 3:
-                break
-                
-            # Wait between posts
-            time.sleep(30)
+        # Wait between posts
+        pacer.wait()
+        if not publish_article(article, state):
+            return False
+        pacer.record()
+        posted[target] += 1
+        
+        # Limit posts per cycle to avoid API rate limits
+        if not open_targets():
+            pipeline.stop()
+        return True
+    
+    def claimed_jobs():
+        while not pipeline.stopped.is_set():
+            job = job_queue.claim(WORKER_ID, targets=open_targets())
+            if job is None:
+                return
+            yield job
+    
+    pipeline = Pipeline(preparation_stages(job_queue, page_store) + [
+        Stage('publish', job_stage(job_queue, 'published', publish), 1, STAGE_QUEUE_SIZE)
+    ])
+    try:
+        pipeline.run(claimed_jobs())
+    finally:
+        # Hand back jobs dropped when the post limit was reached
+        job_queue.release_all(WORKER_ID)
     
+    articles_posted = sum(posted.values())
     logging.info(f"Posted {articles_posted} new articles")
+    housekeeping(state)
+    beat(last_cycle_posted=articles_posted)
+    return articles_posted
+
+def poll_feeds(state, wake, stop):
+    """Poll the feeds on adaptive intervals until `stop` is set, setting `wake` when articles are queued."""
+    interval = AdaptiveInterval(POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_TARGET_NEW)
+    feed_count = len(news_feeds(state.targets.values()))
+    warned = False
+    while not stop.is_set():
+        started = time.time()
+        requests_before = news_quota.total
+        queued = 0
+        try:
+            # Polls closer together than the cache TTL would only see cached feeds
+            queued = enqueue_new_articles(state, ttl=POLL_MIN_INTERVAL / 2)
+            if queued:
+                wake.set()
+            housekeeping(state)
+        except Exception as e:
+            FAILURES.inc(stage='poll', reason=type(e).__name__)
+            logging.error(f"Error polling feeds: {str(e)}")
+        
+        # Follow the news rate, but never poll faster than the daily quota
+        # allows; a poll costs a request per feed and page it read
+        requests_per_poll = max(feed_count, news_quota.total - requests_before)
+        quota_interval = news_quota.min_interval(requests_per_poll)
+        if quota_interval > POLL_MAX_INTERVAL and not warned:
+            logging.warning(f"A NewsAPI quota of {NEWS_API_DAILY_QUOTA} requests per day allows polling "
+                            f"{feed_count} feeds only every {quota_interval / 60:.0f} minutes, longer than "
+                            f"POLL_MAX_INTERVAL; raise NEWS_API_DAILY_QUOTA or follow fewer feeds")
+            warned = True
+        delay = max(interval.update(queued), quota_interval)
+        POLL_INTERVAL.set(delay)
+        logging.info(f"Next feed poll in {delay / 60:.1f} minutes")
+        beat(last_poll=started, next_poll=started + delay)
+        write_metrics_snapshot()
+        stop.wait(delay)
+
+def prepare_jobs(state, page_store, wake, ready, stop):
+    """Run new jobs through the preparation stages as soon as they are queued.
+    
+    Claiming pauses for a target while READY_BACKLOG of its posts are
+    ready or being prepared, so articles that will never get a publish
+    slot are not rewritten. `ready` is set whenever a post is finished.
+    """
+    job_queue = state.job_queue
+    ready_state = STATES[-2]
     
-    # Clean up old hashes (keep only the last 1000)
-    if len(processed_articles) > 1000:
-        processed_articles = set(list(processed_articles)[-1000:])
-        save_processed_articles(processed_articles)
+    def claimed_jobs():
+        while not stop.is_set():
+            wake.clear()
+            targets = [name for name in state.targets
+                       if job_queue.backlog(ready_state, WORKER_ID, name) < READY_BACKLOG]
+            job = job_queue.claim(WORKER_ID, states=STATES[:-2], targets=targets)
+            if job is None:
+                wake.wait(60)
+                continue
+            yield job
+    
+    def release(job):
+        # Any worker serving the target may publish a ready job; nothing is
+        # returned so the long-running pipeline does not collect results
+        job_queue.release(job, WORKER_ID)
+        wake.set()
+        ready.set()
+        return None
+    
+    pipeline = Pipeline(preparation_stages(job_queue, page_store) + [Stage('ready', release, 1, STAGE_QUEUE_SIZE)])
+    pipeline.run(claimed_jobs())
+
+def publish_ready_jobs(state, wake, ready, stop):
+    """Publish ready jobs, newest first, spacing each target's posts evenly over its posts per day.
+    
+    While nothing is ready, it waits for the preparer to set `ready`.
+    """
+    job_queue = state.job_queue
+    ready_state = STATES[-2]
+    pacers = {
+        name: PublishPacer(86400 / target.posts_per_day, partial(job_queue.last_published_at, name))
+        for name, target in state.targets.items() if target.posts_per_day > 0
+    }
+    while not stop.is_set():
+        beat()
+        due = [name for name, pacer in pacers.items() if pacer.delay() <= 0]
+        if not due:
+            stop.wait(min([60] + [pacer.delay() for pacer in pacers.values()]))
+            continue
+        
+        expired = job_queue.expire(ready_state, READY_MAX_AGE_HOURS * 3600)
+        if expired:
+            ARTICLES.inc(expired, outcome='expired')
+            logging.info(f"Dropped {expired} ready articles older than {READY_MAX_AGE_HOURS} hours")
+        
+        published_any = False
+        ready.clear()
+        for name in due:
+            job = job_queue.claim(WORKER_ID, states=[ready_state], targets=[name])
+            if job is None:
+                continue
+            if not publish_article(job['article'], state):
+                job_queue.fail(job, "published stage failed", WORKER_ID)
+                continue
+            job_queue.advance(job, STATES[-1], WORKER_ID)
+            pacers[name].record()
+            published_any = True
+        
+        if published_any:
+            # Publish slots opened up in the ready backlog
+            wake.set()
+        else:
+            ready.wait(60)
+
+def write_metrics_snapshot():
+    """Write the current metrics to METRICS_FILE for check_status.py."""
+    try:
+        registry.write_snapshot(METRICS_FILE)
+    except Exception as e:
+        logging.warning(f"Could not write metrics snapshot: {str(e)}")
+
+def start_metrics_server():
+    """Expose the metrics on the local HTTP endpoint, if enabled."""
+    if not METRICS_PORT:
+        return
+    try:
+        metrics.start_server(registry, METRICS_PORT)
+        logging.info(f"Serving metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+    except OSError as e:
+        logging.warning(f"Could not start metrics server on port {METRICS_PORT}: {str(e)}")
+
+def beat(**fields):
+    """Update the heartbeat file, never letting a failure stop the bot."""
+    try:
+        write_heartbeat(HEARTBEAT_FILE, pid=os.getpid(), worker_id=WORKER_ID, **fields)
+    except Exception as e:
+        logging.warning(f"Could not write heartbeat: {str(e)}")
+
+def run_cycle():
+    """Run one processing cycle and save the metrics it produced; returns the number of posts."""
+    beat(status='running', cycle_started=time.time())
+    try:
+        return process_news()
+    finally:
+        write_metrics_snapshot()
+        beat(status='idle', cycle_finished=time.time())
 
 def run_scheduler():
-    """Run the scheduler to process news every 4 hours."""
-    schedule.every(4).hours.do(process_news)
+    """Poll, prepare and publish continuously instead of in fixed cycles.
+    
+    A poller thread fetches the feeds on adaptive intervals and queues new
+    articles, a preparation pipeline picks them up right away, and the
+    main thread publishes ready posts evenly across the day, for every
+    blog target of this shard.
+    """
+    start_metrics_server()
+    beat(status='running', started=time.time())
     
-    # Run once immediately
-    process_news()
+    state = BotState()
+    state.job_queue.release_all(WORKER_ID)
     
-    # Keep the script running
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    wake = threading.Event()
+    ready = threading.Event()
+    stop = threading.Event()
+    page_store = new_page_store(max_pages=200)
+    threading.Thread(target=poll_feeds, args=(state, wake, stop), name='feed-poller', daemon=True).start()
+    threading.Thread(target=prepare_jobs, args=(state, page_store, wake, ready, stop), name='preparer', daemon=True).start()
+    try:
+        publish_ready_jobs(state, wake, ready, stop)
+    finally:
+        stop.set()
+        wake.set()
+        state.job_queue.release_all(WORKER_ID)
+        write_metrics_snapshot()
+        beat(status='stopped')
 
-if __name__ == "__main__":
+def main():
+    """Configure logging and run the bot until it is stopped."""
+    configure_logging()
     logging.info("Starting Science and Technology News Bot")
     run_scheduler()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""Command line entry point of the news bot: python -m newsbot <command>.
+
+Importing the package loads nothing but the standard library; each
+command imports the modules it needs when it runs.
+"""
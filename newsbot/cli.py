@@ -0,0 +1,45 @@
+"""Single command line for running and checking the bot.
+
+Usage:
+    python -m newsbot run       # poll, prepare and publish continuously
+    python -m newsbot once      # run one processing cycle and exit
+    python -m newsbot status    # report health from the log, heartbeat and metrics
+    python -m newsbot check     # test the OpenAI, NewsAPI and Blogger connections
+    python -m newsbot setup     # authorize access to the blog
+"""
+import argparse
+import sys
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='newsbot', description="Science and technology news bot.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('run', help="poll, prepare and publish continuously")
+    commands.add_parser('once', help="run one processing cycle and exit")
+    commands.add_parser('status', help="report the bot's health")
+    commands.add_parser('check', help="test the API connections")
+    commands.add_parser('setup', help="authorize access to the blog")
+    args = parser.parse_args(argv)
+
+    # Only the command that runs pays for its imports, so status and
+    # check start without loading the bot and its libraries
+    if args.command == 'run':
+        import news_aggregator
+        news_aggregator.main()
+    elif args.command == 'once':
+        import news_aggregator
+        news_aggregator.configure_logging()
+        posted = news_aggregator.run_cycle()
+        print(f"Posted {posted} articles")
+    elif args.command == 'status':
+        import check_status
+        check_status.check_bot_status()
+    elif args.command == 'check':
+        import test_connections
+        test_connections.test_connections()
+    elif args.command == 'setup':
+        import setup
+        setup.setup_blogger_auth()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
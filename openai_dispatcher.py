@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+import openai
+from openai import api_requestor, error, util
+
+from token_budget import count_prompt_tokens
+
+# Errors worth another attempt
+RETRYABLE_ERRORS = (error.RateLimitError, error.Timeout, error.APIConnectionError,
+                    error.ServiceUnavailableError, error.TryAgain)
+
+DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+def parse_duration(value):
+    """Parse a rate-limit reset duration such as '6m0s' or '20ms' into seconds."""
+    if not value:
+        return None
+    seconds = sum(float(amount) * DURATION_UNITS[unit] for amount, unit in DURATION_RE.findall(value))
+    return seconds or None
+
+def _int_header(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+class AsyncTokenBucket:
+    """Per-minute token bucket for asyncio code that can follow server-reported limits."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            wait = self.paused_until - time.monotonic()
+            if wait <= 0 and self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep(max(wait, (amount - self.tokens) / self.rate, 0.05))
+
+    def update(self, limit=None, remaining=None, reset=None):
+        """Adopt the limit and remaining budget reported by the API."""
+        self._refill()
+        if limit:
+            self.capacity = float(limit)
+            self.rate = self.capacity / 60
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+            if remaining == 0 and reset:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+
+class OpenAIDispatcher:
+    """Runs chat completions on a background asyncio loop.
+
+    At most `concurrency` requests are in flight, request and token
+    buckets keep usage under the per-minute limits (and follow the
+    x-ratelimit-* headers the API returns), and rate-limit, timeout and
+    server errors are retried with jittered exponential backoff. Threads
+    call create(), which blocks until the completion is available.
+    """
+
+    def __init__(self, concurrency=4, requests_per_minute=500, tokens_per_minute=10000,
+                 max_retries=5, timeout=120, backoff_base=2.0, backoff_cap=60.0):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.requests = AsyncTokenBucket(requests_per_minute)
+        self.tokens = AsyncTokenBucket(tokens_per_minute)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='openai-dispatcher', daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self.loop).result()
+
+    async def _setup(self):
+        import aiohttp
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession()
+
+    def _adapt(self, headers):
+        if not headers:
+            return
+        self.requests.update(
+            _int_header(headers, 'x-ratelimit-limit-requests'),
+            _int_header(headers, 'x-ratelimit-remaining-requests'),
+            parse_duration(headers.get('x-ratelimit-reset-requests'))
+        )
+        self.tokens.update(
+            _int_header(headers, 'x-ratelimit-limit-tokens'),
+            _int_header(headers, 'x-ratelimit-remaining-tokens'),
+            parse_duration(headers.get('x-ratelimit-reset-tokens'))
+        )
+
+    def _backoff(self, attempt, headers):
+        retry_after = None
+        if headers:
+            try:
+                retry_after = float(headers.get('retry-after'))
+            except (TypeError, ValueError):
+                pass
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        return max(retry_after or 0, delay * random.uniform(0.5, 1.5))
+
+    async def _request(self, params):
+        openai.aiosession.set(self.session)
+        requestor = api_requestor.APIRequestor()
+        response, _, api_key = await requestor.arequest(
+            'post', '/chat/completions', params=params, request_timeout=self.timeout
+        )
+        headers = getattr(response, '_headers', None) or {}
+        return util.convert_to_openai_object(response, api_key), headers
+
+    async def acreate(self, **params):
+        """Create a chat completion, waiting for rate-limit budget and retrying transient errors."""
+        estimated = count_prompt_tokens(params['messages'], params['model'], params.get('functions'))
+        estimated += params.get('max_tokens') or 0
+
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated)
+            async with self.semaphore:
+                try:
+                    response, headers = await self._request(params)
+                    self._adapt(headers)
+                    return response
+                except error.OpenAIError as e:
+                    retryable = isinstance(e, RETRYABLE_ERRORS) or (
+                        isinstance(e, error.APIError) and (e.http_status or 0) >= 500
+                    )
+                    if not retryable or attempt == self.max_retries:
+                        raise
+                    headers = getattr(e, 'headers', None) or {}
+                    self._adapt(headers)
+                    delay = self._backoff(attempt, headers)
+                    logging.warning(f"OpenAI request failed ({str(e)}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def create(self, **params):
+        """Blocking wrapper around acreate() for use from worker threads."""
+        return asyncio.run_coroutine_threadsafe(self.acreate(**params), self.loop).result()
+
+    def close(self):
+        """Close the HTTP session and stop the background loop."""
+        if not self.thread.is_alive():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result(timeout=10)
+        except Exception as e:
+            logging.warning(f"Could not close the OpenAI session: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
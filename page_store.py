@@ -0,0 +1,239 @@
+import codecs
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from http_cache import content_encoding
+
+# Number of leading paragraphs kept from each page
+MAX_PARAGRAPHS = 5
+
+# Parsing stops once MAX_PARAGRAPHS paragraphs were found and either
+# MAX_IMAGES <img> candidates were collected or IMAGE_LOOKAHEAD more
+# characters were read looking for them
+MAX_IMAGES = 10
+IMAGE_LOOKAHEAD = 32 * 1024
+
+# Bytes read from the network per chunk
+CHUNK_SIZE = 16 * 1024
+
+# Content types parsed as HTML; anything else is skipped without reading the body
+HTML_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Elements whose text never belongs to a paragraph, and block elements
+# whose start or end also ends a paragraph left open
+SKIPPED_ELEMENTS = {'script', 'style', 'noscript', 'template'}
+BLOCK_ELEMENTS = {'article', 'aside', 'blockquote', 'body', 'div', 'figure', 'footer', 'form', 'header',
+                  'li', 'main', 'nav', 'ol', 'section', 'table', 'td', 'ul'}
+
+class Page:
+    """Artifacts extracted from an article page in a single parse."""
+
+    def __init__(self, url, status_code=None, paragraphs=None, og_image=None,
+                 twitter_image=None, images=None, canonical_url=None):
+        self.url = url
+        self.status_code = status_code
+        self.paragraphs = paragraphs or []
+        self.og_image = og_image
+        self.twitter_image = twitter_image
+        self.images = images or []
+        self.canonical_url = canonical_url
+
+    @property
+    def ok(self):
+        return self.status_code == 200
+
+class PageExtractor(HTMLParser):
+    """Incremental parser that collects what later stages need from an article page.
+
+    Feed it the page in chunks; `done` turns true as soon as enough
+    paragraphs and image candidates were found, so the rest of the page
+    need not be downloaded or parsed.
+    """
+
+    def __init__(self, url):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.paragraphs = []
+        self.meta = {}
+        self.images = []
+        self.canonical_url = None
+        self.received = 0
+        self.paragraphs_done_at = None
+        self._skipping = 0
+        self._paragraph = None
+        self._text = []
+
+    @property
+    def done(self):
+        if self.paragraphs_done_at is None:
+            return False
+        return len(self.images) >= MAX_IMAGES or self.received - self.paragraphs_done_at >= IMAGE_LOOKAHEAD
+
+    def feed(self, data):
+        self.received += len(data)
+        super().feed(data)
+
+    def _flush_text(self):
+        # Text may arrive in several pieces; words are only split at tags
+        text = ' '.join(''.join(self._text).split())
+        self._text = []
+        if text and self._paragraph is not None:
+            self._paragraph.append(text)
+
+    def _end_paragraph(self):
+        self._flush_text()
+        if self._paragraph and len(self.paragraphs) < MAX_PARAGRAPHS:
+            self.paragraphs.append(' '.join(self._paragraph))
+            if len(self.paragraphs) == MAX_PARAGRAPHS:
+                self.paragraphs_done_at = self.received
+        self._paragraph = None
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in SKIPPED_ELEMENTS:
+            self._skipping += 1
+            return
+        attrs = {name: (value or '') for name, value in attrs}
+        if tag == 'p':
+            self._end_paragraph()
+            self._paragraph = []
+        elif tag in BLOCK_ELEMENTS:
+            self._end_paragraph()
+        elif tag == 'meta':
+            key = attrs.get('property') or attrs.get('name')
+            if key and attrs.get('content'):
+                self.meta.setdefault(key.lower(), attrs['content'].strip())
+        elif tag == 'img':
+            src = attrs.get('src', '').strip()
+            if src and not src.startswith('data:') and len(self.images) < MAX_IMAGES:
+                self.images.append({
+                    'src': urljoin(self.url, src),
+                    'width': attrs.get('width'),
+                    'height': attrs.get('height'),
+                    'alt': attrs.get('alt', '')
+                })
+        elif tag == 'link' and self.canonical_url is None:
+            if 'canonical' in attrs.get('rel', '').lower().split() and attrs.get('href'):
+                self.canonical_url = urljoin(self.url, attrs['href'])
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_ELEMENTS:
+            self._skipping = max(0, self._skipping - 1)
+            return
+        if tag == 'p' or tag in BLOCK_ELEMENTS:
+            self._end_paragraph()
+        else:
+            self._flush_text()
+
+    def handle_data(self, data):
+        if self._paragraph is not None and not self._skipping:
+            self._text.append(data)
+
+    def _meta_url(self, *keys):
+        for key in keys:
+            if self.meta.get(key):
+                return urljoin(self.url, self.meta[key])
+        return None
+
+    def page(self):
+        """Return the Page holding everything found so far."""
+        self.close()
+        self._end_paragraph()
+        return Page(
+            self.url,
+            status_code=200,
+            paragraphs=self.paragraphs,
+            og_image=self._meta_url('og:image', 'og:image:secure_url'),
+            twitter_image=self._meta_url('twitter:image', 'twitter:image:src'),
+            images=self.images,
+            canonical_url=self.canonical_url
+        )
+
+def is_html(headers):
+    content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+    # Servers that send no content type mostly serve HTML
+    return not content_type or content_type in HTML_TYPES
+
+def parse_page(url, html):
+    """Parse an article page once and pull out everything later stages need."""
+    extractor = PageExtractor(url)
+    extractor.feed(html)
+    return extractor.page()
+
+def read_page(response, extractor, max_bytes):
+    """Stream an HTML response into `extractor`, stopping when it is done or after `max_bytes`.
+
+    Returns the bytes read, which is all a later parse of the cached copy needs.
+    """
+    if not is_html(response.headers):
+        return b''
+    try:
+        decoder = codecs.getincrementaldecoder(content_encoding(response.headers))(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        chunk = chunk[:max_bytes - size]
+        chunks.append(chunk)
+        size += len(chunk)
+        extractor.feed(decoder.decode(chunk))
+        if extractor.done or size >= max_bytes:
+            break
+    return b''.join(chunks)
+
+class PageStore:
+    """Per-cycle store that fetches and parses each article page at most once.
+
+    Concurrent callers asking for the same URL wait for the first fetch
+    instead of starting their own. A long-lived store keeps only the
+    `max_pages` most recently requested pages.
+    """
+
+    def __init__(self, session, cache, ttl, timeout, max_pages=None, max_bytes=1024 * 1024):
+        self.session = session
+        self.cache = cache
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.pages = OrderedDict()
+
+    def _load(self, url):
+        extractor = PageExtractor(url)
+        try:
+            response = self.cache.get(self.session, url, ttl=self.ttl, timeout=self.timeout,
+                                      read=lambda response: read_page(response, extractor, self.max_bytes))
+            if response.status_code != 200:
+                return Page(url, status_code=response.status_code)
+            if not is_html(response.headers):
+                logging.info(f"Skipped page {url}: not HTML ({response.headers.get('Content-Type')})")
+                return Page(url, status_code=response.status_code)
+            if not extractor.received:
+                # Served from the cache, which holds just the part read on the first fetch
+                extractor.feed(response.text)
+            return extractor.page()
+        except Exception as e:
+            logging.warning(f"Could not fetch page {url}: {str(e)}")
+            return Page(url)
+
+    def get(self, url):
+        """Return the parsed Page for `url`, fetching it on first request."""
+        with self.lock:
+            future = self.pages.get(url)
+            owner = future is None
+            if owner:
+                future = self.pages[url] = Future()
+                if self.max_pages and len(self.pages) > self.max_pages:
+                    self.pages.popitem(last=False)
+            else:
+                self.pages.move_to_end(url)
+        if owner:
+            future.set_result(self._load(url))
+        return future.result()
@@ -0,0 +1,93 @@
+import logging
+import queue
+import threading
+
+# Marks the end of a stage's input
+_DONE = object()
+
+class Stage:
+    """A pipeline stage: `func` run by `workers` threads fed from a bounded queue.
+
+    `func` takes an item and returns the item to hand to the next stage,
+    or None to drop it.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=10):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+
+class Pipeline:
+    """Chain of stages connected by bounded queues.
+
+    Every stage runs its own worker pool, so network waits in different
+    stages overlap. A full queue blocks the upstream workers, which keeps
+    fast stages from racing ahead of slow ones.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.stopped = threading.Event()
+        self.results = []
+        self.lock = threading.Lock()
+
+    def stop(self):
+        """Stop feeding the pipeline; items still queued are dropped."""
+        self.stopped.set()
+
+    def _emit(self, index, item):
+        if index + 1 < len(self.stages):
+            self.stages[index + 1].queue.put(item)
+        else:
+            with self.lock:
+                self.results.append(item)
+
+    def _worker(self, index, remaining):
+        stage = self.stages[index]
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+            if self.stopped.is_set():
+                continue
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                logging.error(f"Error in {stage.name} stage: {str(e)}")
+                continue
+            if result is not None:
+                self._emit(index, result)
+
+        # The last worker of a stage to finish closes the next stage's input
+        with self.lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last and index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                self.stages[index + 1].queue.put(_DONE)
+
+    def run(self, items):
+        """Feed `items` through every stage and return the final stage's outputs."""
+        remaining = [stage.workers for stage in self.stages]
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(index, remaining),
+                    name=f"{stage.name}-{n + 1}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        first = self.stages[0]
+        for item in items:
+            if self.stopped.is_set():
+                break
+            first.queue.put(item)
+        for _ in range(first.workers):
+            first.queue.put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        return self.results
@@ -0,0 +1,71 @@
+import os
+import pickle
+import threading
+import time
+
+import db
+
+class ProcessedStore:
+    """Indexed store of processed article hashes backed by SQLite.
+
+    Membership checks and inserts are primary-key operations, entries are
+    evicted oldest-first by insertion time, and WAL mode lets several
+    worker processes read and write the store at the same time.
+    """
+
+    def __init__(self, path, legacy_file=None):
+        self.lock = threading.Lock()
+        self.conn = db.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed_articles (
+                hash TEXT PRIMARY KEY,
+                added_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS processed_articles_added ON processed_articles (added_at)')
+        if legacy_file:
+            self._migrate(legacy_file)
+
+    def _migrate(self, legacy_file):
+        """Import hashes from the old pickled set the first time the store is opened."""
+        if not os.path.exists(legacy_file) or self.count():
+            return
+        with open(legacy_file, 'rb') as f:
+            hashes = pickle.load(f)
+        now = time.time()
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO processed_articles (hash, added_at) VALUES (?, ?)',
+                [(article_hash, now) for article_hash in hashes]
+            )
+            self.conn.execute('COMMIT')
+
+    def __contains__(self, article_hash):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM processed_articles WHERE hash = ?', (article_hash,)
+            ).fetchone()
+        return row is not None
+
+    def add(self, article_hash):
+        """Record an article hash; adding an existing hash is a no-op."""
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR IGNORE INTO processed_articles (hash, added_at) VALUES (?, ?)',
+                (article_hash, time.time())
+            )
+
+    def count(self):
+        """Return the number of stored hashes without loading them."""
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM processed_articles').fetchone()[0]
+
+    def prune(self, keep):
+        """Evict the oldest hashes so that at most `keep` remain."""
+        with self.lock:
+            self.conn.execute("""
+                DELETE FROM processed_articles WHERE hash NOT IN (
+                    SELECT hash FROM processed_articles ORDER BY added_at DESC LIMIT ?
+                )
+            """, (keep,))
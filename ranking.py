@@ -0,0 +1,72 @@
+import math
+from datetime import datetime
+
+from feed_state import parse_published
+from near_dedup import STOPWORDS, WORD_RE, article_text
+
+# Terms of the stories the blogs are about; a story's relevance is the
+# TF-IDF cosine similarity between its title and description and these
+KEYWORDS = [
+    'research', 'researchers', 'scientists', 'study', 'discovery', 'experiment', 'physics', 'chemistry',
+    'biology', 'genetics', 'gene', 'dna', 'space', 'nasa', 'telescope', 'planet', 'mars', 'moon', 'galaxy',
+    'climate', 'energy', 'battery', 'solar', 'fusion', 'quantum', 'robot', 'robotics', 'ai',
+    'artificial intelligence', 'machine learning', 'chip', 'semiconductor', 'software', 'computer',
+    'cybersecurity', 'satellite', 'vaccine', 'medicine', 'brain', 'technology', 'innovation', 'engineers'
+]
+
+# Share of relevance, recency and coverage (outlets reporting the story) in the score
+RELEVANCE_WEIGHT = 0.5
+RECENCY_WEIGHT = 0.3
+COVERAGE_WEIGHT = 0.2
+
+def _tokens(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+def score_stories(stories, keywords=KEYWORDS, source_weights=None, half_life_hours=6.0, now=None):
+    """Score all candidate stories at once for how much they are worth rewriting.
+
+    Each score mixes keyword relevance, recency (halving every
+    `half_life_hours`) and the size of the story's near-duplicate cluster,
+    and is multiplied by the weight of its source in `source_weights`
+    (1.0 for sources not listed). Returns a NumPy array in story order.
+    """
+    import numpy as np
+
+    if not stories:
+        return np.zeros(0)
+    documents = [_tokens(' '.join(article_text(story))) for story in stories]
+    vocabulary = {}
+    for document in documents:
+        for word in document:
+            vocabulary.setdefault(word, len(vocabulary))
+    keyword_columns = sorted({vocabulary[word] for word in _tokens(' '.join(keywords)) if word in vocabulary})
+
+    # Term counts in one scatter, then TF-IDF with L2-normalized rows
+    rows = np.array([i for i, document in enumerate(documents) for _ in document], dtype=int)
+    columns = np.array([vocabulary[word] for document in documents for word in document], dtype=int)
+    counts = np.zeros((len(stories), max(len(vocabulary), 1)))
+    np.add.at(counts, (rows, columns), 1)
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(stories)) / (1 + document_frequency)) + 1
+    tfidf = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1) * idf
+    tfidf /= np.maximum(np.linalg.norm(tfidf, axis=1, keepdims=True), 1e-12)
+
+    query = np.zeros(tfidf.shape[1])
+    query[keyword_columns] = idf[keyword_columns]
+    relevance = tfidf @ (query / max(np.linalg.norm(query), 1e-12))
+
+    now = now or datetime.utcnow()
+    ages = np.array([
+        (now - published).total_seconds() / 3600 if published else math.inf
+        for published in (parse_published(story.get('publishedAt')) for story in stories)
+    ])
+    recency = 0.5 ** (np.maximum(ages, 0) / half_life_hours)
+
+    cluster_sizes = np.array([story.get('cluster_size') or 1 for story in stories], dtype=float)
+    largest = cluster_sizes.max()
+    coverage = np.log(cluster_sizes) / np.log(largest) if largest > 1 else np.zeros(len(stories))
+
+    source_weights = source_weights or {}
+    weights = np.array([source_weights.get((story.get('source') or {}).get('name'), 1.0) for story in stories])
+
+    return (RELEVANCE_WEIGHT * relevance + RECENCY_WEIGHT * recency + COVERAGE_WEIGHT * coverage) * weights
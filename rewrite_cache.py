@@ -0,0 +1,207 @@
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+
+import db
+
+CACHE_DB_FILE = "cache.db"
+
+def normalize_text(text):
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return ' '.join((text or '').split())
+
+class RewriteCache:
+    """Content-addressed cache of AI rewrite results.
+
+    Entries are keyed by a hash of the normalized source content, the
+    prompt template version and the model, so a retry or replay of the
+    same article reuses the stored output instead of paying for another
+    completion. Hit/miss counters are persisted alongside the entries.
+    """
+
+    def __init__(self, path, max_entries=500, max_age=30 * 86400):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.conn = db.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rewrite_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                source_url TEXT,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS rewrite_cache_access ON rewrite_cache (last_access)')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rewrite_cache_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def make_key(source, prompt_version, model):
+        """Hash the normalized source fields together with the prompt version and model."""
+        parts = [str(prompt_version), model] + [normalize_text(value) for value in source]
+        return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+    def _count(self, name):
+        self.conn.execute("""
+            INSERT INTO rewrite_cache_counters (name, value) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1
+        """, (name,))
+
+    def get(self, key):
+        """Return the cached result for `key`, or None."""
+        with self.lock:
+            row = self.conn.execute('SELECT result, created_at FROM rewrite_cache WHERE key = ?', (key,)).fetchone()
+            if row and time.time() - row[1] < self.max_age:
+                self.conn.execute(
+                    'UPDATE rewrite_cache SET last_access = ?, hits = hits + 1 WHERE key = ?', (time.time(), key)
+                )
+                self._count('hits')
+                return json.loads(row[0])
+            self._count('misses')
+        return None
+
+    def put(self, key, result, model, prompt_version, source_url=None):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO rewrite_cache VALUES (?, ?, ?, ?, ?, ?, ?, 0)',
+                (key, model, str(prompt_version), source_url, json.dumps(result), now, now)
+            )
+
+    def evict(self):
+        """Drop entries older than max_age, then the least recently used beyond max_entries."""
+        with self.lock:
+            expired = self.conn.execute(
+                'DELETE FROM rewrite_cache WHERE created_at < ?', (time.time() - self.max_age,)
+            ).rowcount
+            overflow = self.conn.execute("""
+                DELETE FROM rewrite_cache WHERE key NOT IN (
+                    SELECT key FROM rewrite_cache ORDER BY last_access DESC LIMIT ?
+                )
+            """, (self.max_entries,)).rowcount
+        return expired + overflow
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM rewrite_cache')
+            self.conn.execute('DELETE FROM rewrite_cache_counters')
+
+    def stats(self):
+        """Return entry count, stored bytes and the lifetime hit rate."""
+        with self.lock:
+            entries, size = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(LENGTH(result)), 0) FROM rewrite_cache'
+            ).fetchone()
+            counters = dict(self.conn.execute('SELECT name, value FROM rewrite_cache_counters').fetchall())
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'entries': entries,
+            'bytes': size,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+        }
+
+    def entries(self, limit=20):
+        """Return the most recently used entries without their payloads."""
+        with self.lock:
+            return self.conn.execute("""
+                SELECT key, model, prompt_version, source_url, created_at, last_access, hits
+                FROM rewrite_cache ORDER BY last_access DESC LIMIT ?
+            """, (limit,)).fetchall()
+
+    def entry(self, key_prefix):
+        """Return the full result of the entry whose key starts with `key_prefix`."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT result FROM rewrite_cache WHERE key LIKE ? LIMIT 1', (key_prefix + '%',)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+def warm(limit):
+    """Rewrite the current unprocessed stories so the next cycle finds them cached."""
+    import news_aggregator
+
+    news_aggregator.configure_logging()
+    state = news_aggregator.BotState()
+    targets = list(state.targets.values())
+    stories = news_aggregator.dedupe_articles(news_aggregator.fetch_science_tech_news(targets=targets))
+    stories = news_aggregator.rank_stories(stories)
+    articles = {}
+    for target, story in news_aggregator.route_stories(stories, targets, state.signature_stores):
+        if news_aggregator.get_article_hash(story, target.name) not in state.processed_articles:
+            articles.setdefault(story['url_key'], story)
+    articles = sorted(articles.values(), key=lambda story: story['score'], reverse=True)
+
+    page_store = news_aggregator.new_page_store()
+    warmed = 0
+    for article in articles[:limit]:
+        news_aggregator.extract_article_content(article, page_store)
+        if news_aggregator.rewrite_with_ai(article):
+            warmed += 1
+    print(f"Warmed {warmed} of {min(limit, len(articles))} articles")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and manage the AI rewrite cache.")
+    parser.add_argument('--db', default=CACHE_DB_FILE, help="cache database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help="show size and hit rate")
+    list_parser = commands.add_parser('list', help="list the most recently used entries")
+    list_parser.add_argument('--limit', type=int, default=20)
+    show_parser = commands.add_parser('show', help="print a cached result")
+    show_parser.add_argument('key', help="cache key or key prefix")
+    evict_parser = commands.add_parser('evict', help="drop expired and least recently used entries")
+    evict_parser.add_argument('--max-entries', type=int, default=500)
+    evict_parser.add_argument('--max-age-days', type=int, default=30)
+    commands.add_parser('clear', help="delete all entries and counters")
+    warm_parser = commands.add_parser('warm', help="rewrite current unprocessed stories into the cache")
+    warm_parser.add_argument('--limit', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == 'warm':
+        warm(args.limit)
+        return 0
+
+    if args.command == 'evict':
+        cache = RewriteCache(args.db, max_entries=args.max_entries, max_age=args.max_age_days * 86400)
+        print(f"Evicted {cache.evict()} entries")
+        return 0
+
+    cache = RewriteCache(args.db)
+    if args.command == 'stats':
+        for name, value in cache.stats().items():
+            print(f"{name}: {value:.2%}" if name == 'hit_rate' else f"{name}: {value}")
+    elif args.command == 'list':
+        for key, model, version, url, created_at, last_access, hits in cache.entries(args.limit):
+            print(f"{key[:16]}  {model}  v{version}  hits={hits}  created={_format_time(created_at)}  "
+                  f"used={_format_time(last_access)}  {url}")
+    elif args.command == 'show':
+        result = cache.entry(args.key)
+        if result is None:
+            print(f"No cache entry matches {args.key}")
+            return 1
+        print(json.dumps(result, indent=2))
+    elif args.command == 'clear':
+        cache.clear()
+        print("Rewrite cache cleared")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,26 @@
 import os
+import socket
 import sys
 import time
 from subprocess import Popen
 import logging
+from log_setup import setup_logging
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("service_monitor.log"),
-        logging.StreamHandler()
-    ]
-)
+setup_logging("service_monitor.log", max_bytes=1024 * 1024, backup_count=3)
 
 def run_bot():
     """Run the news bot and monitor it."""
+    # Keep the worker id stable across restarts so the restarted bot
+    # resumes the jobs the crashed one was working on
+    env = dict(os.environ)
+    env.setdefault('WORKER_ID', f"{socket.gethostname()}-service")
+    
     while True:
         logging.info("Starting news bot process...")
         
         # Start the bot process
-        process = Popen([sys.executable, 'news_aggregator.py'])
+        process = Popen([sys.executable, 'news_aggregator.py'], env=env)
         
         # Monitor the process
         try:
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import deque
+
+class AdaptiveInterval:
+    """Poll interval that follows the observed rate of new articles.
+
+    The interval is chosen so that about `target_new` new articles are
+    waiting at each poll: it shrinks while stories keep arriving and
+    doubles after every poll that found nothing, always staying between
+    `min_interval` and `max_interval` seconds.
+    """
+
+    def __init__(self, min_interval, max_interval, target_new=3, smoothing=0.3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new = target_new
+        self.smoothing = smoothing
+        self.interval = min_interval
+        self.rate = None
+        self.last_poll = None
+
+    def update(self, new_items):
+        """Record the number of new articles a poll found and return the seconds until the next poll."""
+        now = time.monotonic()
+        if self.last_poll is not None:
+            observed = new_items / max(now - self.last_poll, 1)
+            if self.rate is None:
+                self.rate = observed
+            else:
+                self.rate = self.smoothing * observed + (1 - self.smoothing) * self.rate
+        self.last_poll = now
+
+        if new_items == 0:
+            self.interval *= 2
+        elif self.rate:
+            self.interval = self.target_new / self.rate
+        self.interval = min(self.max_interval, max(self.min_interval, self.interval))
+        return self.interval
+
+class QuotaTracker:
+    """Keeps API usage within a daily request quota.
+
+    Requests are counted over a rolling `window`. When the API reports its
+    own remaining budget in X-RateLimit-Remaining/X-RateLimit-Reset headers,
+    or answers that the limit was hit, that takes precedence.
+    """
+
+    def __init__(self, daily_quota, window=86400):
+        self.daily_quota = daily_quota
+        self.window = window
+        self.lock = threading.Lock()
+        self.requests = deque()
+        self.total = 0
+        self.remaining = None
+        self.reset_at = None
+
+    def _expire(self, now):
+        while self.requests and self.requests[0] <= now - self.window:
+            self.requests.popleft()
+
+    def record(self, count=1):
+        """Count `count` requests made just now."""
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            self.requests.extend([now] * count)
+            self.total += count
+
+    def update(self, headers):
+        """Adopt the remaining budget reported in the response headers, if any."""
+        try:
+            remaining = int(headers.get('X-RateLimit-Remaining'))
+            reset = float(headers.get('X-RateLimit-Reset'))
+        except (TypeError, ValueError):
+            return
+        # The reset is either a Unix timestamp or the seconds left in the window
+        reset_at = reset if reset > 1e9 else time.time() + reset
+        with self.lock:
+            self.remaining = remaining
+            self.reset_at = reset_at
+
+    def exhausted(self, retry_after=3600):
+        """Record that the API refused a request because the quota is used up."""
+        with self.lock:
+            self.remaining = 0
+            self.reset_at = time.time() + retry_after
+
+    def min_interval(self, requests_per_poll):
+        """Return the shortest interval between polls that spreads the remaining quota evenly."""
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            interval = self.window * requests_per_poll / self.daily_quota
+            if len(self.requests) + requests_per_poll > self.daily_quota and self.requests:
+                interval = max(interval, self.requests[0] + self.window - now)
+            if self.reset_at is not None and self.reset_at > now:
+                if self.remaining < requests_per_poll:
+                    interval = max(interval, self.reset_at - now)
+                else:
+                    interval = max(interval, (self.reset_at - now) * requests_per_poll / self.remaining)
+            return interval
+
+class PublishPacer:
+    """Spaces posts at least `interval` seconds apart.
+
+    `last_published` may return the time of the latest post made by any
+    worker, so processes sharing the job queue also share the pace.
+    """
+
+    def __init__(self, interval, last_published=None):
+        self.interval = interval
+        self.last_published = last_published
+        self.last = None
+
+    def delay(self):
+        """Return the seconds until the next post may be made."""
+        times = [self.last]
+        if self.last_published:
+            times.append(self.last_published())
+        times = [t for t in times if t is not None]
+        if not times:
+            return 0
+        return max(0, max(times) + self.interval - time.time())
+
+    def wait(self):
+        """Sleep until the next post may be made."""
+        delay = self.delay()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self):
+        """Note that a post was just made."""
+        self.last = time.time()
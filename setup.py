@@ -1,14 +1,15 @@
 import os
 import json
 import pickle
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 
 # Scopes for Google API
 SCOPES = ['https://www.googleapis.com/auth/blogger']
 
 def setup_blogger_auth():
     """Set up Blogger API authentication."""
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     print("Setting up Blogger API authentication...")
     
     # Get client ID and client secret
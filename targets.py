@@ -0,0 +1,73 @@
+import bisect
+import hashlib
+import json
+
+# Name of the target built from the environment; naming a configured
+# target "default" lets it keep the state of a single-blog installation
+DEFAULT_TARGET = 'default'
+
+class Target:
+    """A blog the bot publishes to, with the feeds it draws from and its post budget."""
+
+    def __init__(self, name, blog_id, countries, categories, queries=(), posts_per_day=18,
+                 labels=(), author=None):
+        self.name = name
+        self.blog_id = blog_id
+        self.countries = list(countries)
+        self.categories = list(categories)
+        self.queries = list(queries)
+        self.posts_per_day = posts_per_day
+        self.labels = list(labels)
+        self.author = author
+
+    def __repr__(self):
+        return f"Target({self.name!r}, blog {self.blog_id})"
+
+def load_targets(path, defaults):
+    """Read the blog targets from a JSON file.
+
+    The file holds a list of objects with a 'name' and any Target field;
+    fields left out are taken from `defaults`.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    if isinstance(config, dict):
+        config = config.get('targets', [])
+
+    targets = []
+    for entry in config:
+        fields = dict(defaults, **entry)
+        if not fields.get('name') or not fields.get('blog_id'):
+            raise ValueError(f"Target in {path} needs a name and a blog_id: {entry}")
+        targets.append(Target(**fields))
+
+    names = [target.name for target in targets]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate target names in {path}: {', '.join(sorted(duplicates))}")
+    return targets
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(str(key).encode()).digest()[:8], 'big')
+
+class HashRing:
+    """Consistent hash ring that maps keys to nodes.
+
+    Every node owns `replicas` points on the ring, so keys spread evenly
+    and adding or removing a node only moves about 1/n of the keys.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        self.ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self.points = [point for point, _ in self.ring]
+
+    def node_for(self, key):
+        index = bisect.bisect(self.points, _hash(key)) % len(self.ring)
+        return self.ring[index][1]
+
+def shard_targets(targets, shard_index, shard_count):
+    """Return the targets that shard `shard_index` of `shard_count` serves."""
+    if shard_count <= 1:
+        return list(targets)
+    ring = HashRing(range(shard_count))
+    return [target for target in targets if ring.node_for(target.name) == shard_index]
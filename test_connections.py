@@ -1,13 +1,14 @@
 import os
-import requests
-import openai
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 def test_connections():
     """Test connections to required APIs."""
+    import openai
+    import requests
+    from dotenv import load_dotenv
+
+    # Load environment variables
+    load_dotenv()
+
     print("Testing API Connections")
     print("======================")
     
@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+from functools import lru_cache
+
+# TOKEN_COUNTING=estimate always uses the character-based estimate, so
+# tiktoken never downloads its encodings (e.g. when running offline)
+if os.getenv("TOKEN_COUNTING") == "estimate":
+    tiktoken = None
+else:
+    try:
+        import tiktoken
+    except ImportError:  # fall back to a character-based estimate
+        tiktoken = None
+
+# Context window sizes in tokens
+CONTEXT_WINDOWS = {
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-3.5-turbo': 4096,
+    'gpt-3.5-turbo-16k': 16384
+}
+
+# Tokens the chat format adds per message and to prime the reply
+TOKENS_PER_MESSAGE = 4
+REPLY_PRIMING_TOKENS = 3
+
+def context_window(model):
+    for name in sorted(CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(name):
+            return CONTEXT_WINDOWS[name]
+    return 4096
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    """Return the tiktoken encoding of `model`, or None to fall back to the estimate.
+
+    tiktoken downloads encodings on first use (or reads them from
+    TIKTOKEN_CACHE_DIR); if that fails, token counts are estimated for
+    the rest of the process instead of failing every rewrite.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding('cl100k_base')
+    except Exception as e:
+        logging.warning(f"Could not load the tiktoken encoding for {model}, estimating tokens instead: {str(e)}")
+        return None
+
+def count_tokens(text, model):
+    """Count the tokens in `text`, estimating ~4 characters per token without a tiktoken encoding."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+def trim_to_tokens(text, max_tokens, model):
+    """Cut `text` down to at most `max_tokens` tokens."""
+    if max_tokens <= 0:
+        return ''
+    encoding = _encoding(model)
+    if encoding is None:
+        limit = max_tokens * 4
+        if len(text) <= limit:
+            return text
+        return text[:limit].rsplit(' ', 1)[0]
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def count_prompt_tokens(messages, model, functions=None):
+    """Estimate the prompt tokens of a chat request, including function definitions."""
+    total = REPLY_PRIMING_TOKENS
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message['content'], model)
+    if functions:
+        total += count_tokens(json.dumps(functions), model)
+    return total